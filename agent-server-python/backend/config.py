@@ -1,16 +1,157 @@
 import os
+import json
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from tools.goal_tools import add_goal_tool, list_goal_categories
 
 load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
+# OpenAI's base URL can be overridden with OPENAI_BASE_URL (read by the client),
+# e.g. to point both providers at local fake servers
+DEEPSEEK_BASE_URL = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com/v1")
 
-os.environ["LANGCHAIN_TRACING_V2"] = "true"
-os.environ["LANGCHAIN_HIDE_INPUTS"] = "false"
-os.environ["LANGCHAIN_HIDE_OUTPUTS"] = "false"
+# Upper bound on concurrent blocking Firestore calls per worker process
+FIRESTORE_MAX_WORKERS = int(os.getenv("FIRESTORE_MAX_WORKERS", "16"))
+
+# Per-user context (profile, goals, moods) cache; TTL of 0 disables it
+USER_CONTEXT_CACHE_TTL = float(os.getenv("USER_CONTEXT_CACHE_TTL", "300"))
+USER_CONTEXT_CACHE_SIZE = int(os.getenv("USER_CONTEXT_CACHE_SIZE", "1024"))
+
+# Listener-fed user context: keep a live snapshot per active user instead of
+# reading Firestore each turn. Source is "firestore" or "local" (offline).
+USER_SNAPSHOTS_ENABLED = os.getenv("USER_SNAPSHOTS_ENABLED", "false").lower() == "true"
+USER_SNAPSHOT_SOURCE = os.getenv("USER_SNAPSHOT_SOURCE", "firestore")
+USER_SNAPSHOT_IDLE_SECONDS = float(os.getenv("USER_SNAPSHOT_IDLE_SECONDS", "900"))
+USER_SNAPSHOT_MAX_USERS = int(os.getenv("USER_SNAPSHOT_MAX_USERS", "2000"))
+USER_SNAPSHOT_INITIAL_TIMEOUT = float(os.getenv("USER_SNAPSHOT_INITIAL_TIMEOUT", "2.0"))
+# A user whose listener failed to load is read directly for this long
+USER_SNAPSHOT_RETRY_SECONDS = float(os.getenv("USER_SNAPSHOT_RETRY_SECONDS", "60"))
+
+# Mood history query: max entries per turn, and whether to also query legacy
+# docs whose endDate is an ISO string rather than a timestamp
+MOOD_QUERY_LIMIT = int(os.getenv("MOOD_QUERY_LIMIT", "200"))
+MOOD_LEGACY_STRING_DATES = os.getenv("MOOD_LEGACY_STRING_DATES", "true").lower() == "true"
+
+# Local keyword router in front of the gpt-4o-mini routing call
+FAST_ROUTER_ENABLED = os.getenv("FAST_ROUTER_ENABLED", "true").lower() == "true"
+FAST_ROUTER_MIN_CONFIDENCE = float(os.getenv("FAST_ROUTER_MIN_CONFIDENCE", "0.7"))
+
+# Goal-intent gate: only goal-setting messages go through goal extraction.
+# Ambiguous wording is settled by gpt-4o-mini unless the fallback is off.
+GOAL_INTENT_GATE_ENABLED = os.getenv("GOAL_INTENT_GATE_ENABLED", "true").lower() == "true"
+GOAL_INTENT_LLM_FALLBACK = os.getenv("GOAL_INTENT_LLM_FALLBACK", "true").lower() == "true"
+
+# One structured gpt-4o-mini call for route + intent + goal/mood fields,
+# replacing the separate router, intent and extraction calls.
+PREFLIGHT_ENABLED = os.getenv("PREFLIGHT_ENABLED", "false").lower() == "true"
+
+# Max sentences synthesized concurrently in pipelined voice replies
+TTS_PIPELINE_WINDOW = int(os.getenv("TTS_PIPELINE_WINDOW", "3"))
+
+# Voice uploads: size guard (Whisper accepts up to 25 MB) and opt-in sampled
+# debug capture of received audio
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+VOICE_DEBUG_SAMPLE_RATE = float(os.getenv("VOICE_DEBUG_SAMPLE_RATE", "0"))
+VOICE_DEBUG_DIR = os.getenv("VOICE_DEBUG_DIR", "debug_audio")
+
+# Opt-in cache of non-personalized persona replies: exact match, then
+# embedding similarity above the threshold
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+RESPONSE_CACHE_SEMANTIC = os.getenv("RESPONSE_CACHE_SEMANTIC", "true").lower() == "true"
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2048"))
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.92"))
+
+# Prompt size control: token cap for the assembled prompt, rolling summaries
+# of turns that no longer fit, and caps on goals/moods in the user context
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "8000"))
+HISTORY_SUMMARY_ENABLED = os.getenv("HISTORY_SUMMARY_ENABLED", "true").lower() == "true"
+HISTORY_SUMMARY_CHUNK = int(os.getenv("HISTORY_SUMMARY_CHUNK", "8"))
+CONTEXT_MAX_GOALS = int(os.getenv("CONTEXT_MAX_GOALS", "10"))
+CONTEXT_MAX_MOODS = int(os.getenv("CONTEXT_MAX_MOODS", "14"))
+# Moods go into the prompt as a fixed-size summary (distribution, top
+# emotions, weekly trend, latest notes) instead of one line per entry.
+MOOD_SUMMARY_ENABLED = os.getenv("MOOD_SUMMARY_ENABLED", "true").lower() == "true"
+MOOD_SUMMARY_NOTES = int(os.getenv("MOOD_SUMMARY_NOTES", "3"))
+MOOD_SUMMARY_TOP_EMOTIONS = int(os.getenv("MOOD_SUMMARY_TOP_EMOTIONS", "5"))
+# Per-user BM25 index over goals and mood notes: only the goals and notes
+# relevant to the message (and, at lower weight, the persona's domain) are
+# injected. Goals are padded with the most recent up to RETRIEVAL_MIN_GOALS.
+RETRIEVAL_ENABLED = os.getenv("RETRIEVAL_ENABLED", "true").lower() == "true"
+RETRIEVAL_TOP_GOALS = int(os.getenv("RETRIEVAL_TOP_GOALS", "5"))
+RETRIEVAL_MIN_GOALS = int(os.getenv("RETRIEVAL_MIN_GOALS", "3"))
+RETRIEVAL_TOP_NOTES = int(os.getenv("RETRIEVAL_TOP_NOTES", "3"))
+RETRIEVAL_ROUTE_WEIGHT = float(os.getenv("RETRIEVAL_ROUTE_WEIGHT", "0.3"))
+
+# Tool calls: per-call timeout and max concurrent executions per tool
+TOOL_TIMEOUT_SECONDS = float(os.getenv("TOOL_TIMEOUT_SECONDS", "10"))
+TOOL_CONCURRENCY = {
+    "default": int(os.getenv("TOOL_CONCURRENCY_DEFAULT", "8")),
+    "add_goal": int(os.getenv("TOOL_CONCURRENCY_ADD_GOAL", "4")),
+}
+
+# End-to-end request deadlines (seconds) per endpoint, and how often to check
+# whether the client is still connected
+CHAT_DEADLINE_SECONDS = float(os.getenv("CHAT_DEADLINE_SECONDS", "30"))
+CHAT_STREAM_DEADLINE_SECONDS = float(os.getenv("CHAT_STREAM_DEADLINE_SECONDS", "60"))
+VOICE_DEADLINE_SECONDS = float(os.getenv("VOICE_DEADLINE_SECONDS", "45"))
+DISCONNECT_POLL_SECONDS = float(os.getenv("DISCONNECT_POLL_SECONDS", "0.25"))
+
+# Model pool: per-persona backend order (first is primary, the rest are hedge
+# and failover targets), hedging and circuit breaker settings
+PERSONA_MODEL_ORDER = {
+    "physical": ["deepseek", "gpt-4o"],
+    "environmental": ["deepseek", "gpt-4o"],
+    "main": ["gpt-4o-mini", "gpt-4o"],
+    "default": ["gpt-4o", "deepseek"],
+}
+if os.getenv("PERSONA_MODEL_ORDER"):
+    PERSONA_MODEL_ORDER.update(json.loads(os.getenv("PERSONA_MODEL_ORDER")))
+MODEL_HEDGING_ENABLED = os.getenv("MODEL_HEDGING_ENABLED", "true").lower() == "true"
+MODEL_HEDGE_DEFAULT_MS = float(os.getenv("MODEL_HEDGE_DEFAULT_MS", "4000"))
+MODEL_BREAKER_FAILURES = int(os.getenv("MODEL_BREAKER_FAILURES", "5"))
+MODEL_BREAKER_COOLDOWN_SECONDS = float(os.getenv("MODEL_BREAKER_COOLDOWN_SECONDS", "30"))
+
+# Chat titles: small untooled model, bounded fan-out for batches, and a
+# content-hash cache so re-synced conversations are not summarized twice.
+SUMMARY_BATCH_CONCURRENCY = int(os.getenv("SUMMARY_BATCH_CONCURRENCY", "8"))
+SUMMARY_BATCH_MAX = int(os.getenv("SUMMARY_BATCH_MAX", "100"))
+SUMMARY_CACHE_TTL = float(os.getenv("SUMMARY_CACHE_TTL", "86400"))
+SUMMARY_CACHE_SIZE = int(os.getenv("SUMMARY_CACHE_SIZE", "4096"))
+
+# Goal writes: spooled locally and committed to Firestore in the background.
+# Set GOAL_WRITE_BEHIND=false to write inside the request as before.
+GOAL_WRITE_BEHIND = os.getenv("GOAL_WRITE_BEHIND", "true").lower() == "true"
+GOAL_QUEUE_SPOOL_PATH = os.getenv("GOAL_QUEUE_SPOOL_PATH", "goal_queue.sqlite3")
+GOAL_QUEUE_BATCH_SIZE = int(os.getenv("GOAL_QUEUE_BATCH_SIZE", "50"))
+GOAL_QUEUE_FLUSH_MS = float(os.getenv("GOAL_QUEUE_FLUSH_MS", "200"))
+GOAL_QUEUE_MAX_ATTEMPTS = int(os.getenv("GOAL_QUEUE_MAX_ATTEMPTS", "8"))
+GOAL_QUEUE_BACKOFF_BASE_SECONDS = float(os.getenv("GOAL_QUEUE_BACKOFF_BASE_SECONDS", "0.5"))
+GOAL_QUEUE_BACKOFF_MAX_SECONDS = float(os.getenv("GOAL_QUEUE_BACKOFF_MAX_SECONDS", "60"))
+
+# Stage/model/tool latency histograms served at /metrics; optionally echoed
+# per request in a Server-Timing response header.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "false").lower() == "true"
+
+# LangSmith tracing is opt-in and sampled per chat turn (backend/tracing.py).
+# TRACING_PAYLOADS: "capped" masks emails/phone numbers and truncates long
+# strings, "none" hides inputs and outputs, "full" sends them as they are.
+# Runs are exported in batches from a bounded queue; when it is full, runs
+# are dropped rather than held in memory.
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+TRACING_SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", "0.1"))
+TRACING_PAYLOADS = os.getenv("TRACING_PAYLOADS", "capped")
+TRACING_MAX_FIELD_CHARS = int(os.getenv("TRACING_MAX_FIELD_CHARS", "2000"))
+TRACING_QUEUE_MAX = int(os.getenv("TRACING_QUEUE_MAX", "1000"))
+TRACING_BATCH_MAX_BYTES = int(os.getenv("TRACING_BATCH_MAX_BYTES", str(5 * 1024 * 1024)))
+
+# Only sampled turns are traced; nothing is traced from the environment alone
+os.environ["LANGCHAIN_TRACING_V2"] = "false"
+os.environ["LANGSMITH_TRACING_V2"] = "false"
+os.environ["LANGSMITH_TRACING_QUEUE_MAX_SIZE"] = str(TRACING_QUEUE_MAX)
 
 # GPT-4o-mini
 gpt4o_mini = ChatOpenAI(
@@ -18,6 +159,8 @@ gpt4o_mini = ChatOpenAI(
     api_key=OPENAI_API_KEY,
 )
 gpt4o_mini_with_tools = gpt4o_mini.bind_tools([add_goal_tool, list_goal_categories])
+# Titles are a handful of tokens; no tool schemas in the prompt.
+summary_model = gpt4o_mini.bind(max_tokens=16, temperature=0)
 
 # GPT-4o
 gpt4o = ChatOpenAI(
@@ -30,6 +173,14 @@ gpt4o_with_tools = gpt4o.bind_tools([add_goal_tool, list_goal_categories])
 deepseek = ChatOpenAI(
     model="deepseek-chat",
     api_key=DEEPSEEK_API_KEY,
-    base_url="https://api.deepseek.com/v1",
+    base_url=DEEPSEEK_BASE_URL,
+    # Not on by default for non-OpenAI base URLs; needed for streamed usage
+    stream_usage=True,
 )
 deepseek_with_tools = deepseek.bind_tools([add_goal_tool, list_goal_categories])
+
+# Embeddings (semantic response cache)
+embeddings = OpenAIEmbeddings(
+    model="text-embedding-3-small",
+    api_key=OPENAI_API_KEY,
+)
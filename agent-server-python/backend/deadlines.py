@@ -0,0 +1,78 @@
+"""
+End-to-end request deadlines and client-disconnect cancellation.
+
+Cancelling the task that awaits a model call aborts the in-flight HTTP request
+to the provider. Sync tool work already running in a worker thread cannot be
+interrupted, but nothing waits for it and no follow-up model call is made.
+"""
+import asyncio
+from backend.config import DISCONNECT_POLL_SECONDS
+
+REQUEST_STATS = {"cancelled": 0, "deadline_exceeded": 0}
+
+# Yielded by iterate_with_deadline when time runs out
+DEADLINE = object()
+
+class Deadline:
+    """Absolute deadline on the running loop's clock, shared by a request's stages."""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = asyncio.get_running_loop().time() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - asyncio.get_running_loop().time())
+
+async def _wait_for_disconnect(request):
+    while not await request.is_disconnected():
+        await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+
+async def run_with_deadline(request, coro, deadline: Deadline):
+    """
+    Await `coro`, cancelling it if the client disconnects or the deadline
+    passes. Returns (result, status) with status "ok", "cancelled" or
+    "deadline"; result is None unless status is "ok".
+    """
+    task = asyncio.ensure_future(coro)
+    watcher = asyncio.ensure_future(_wait_for_disconnect(request))
+    try:
+        done, _ = await asyncio.wait(
+            {task, watcher}, timeout=deadline.remaining(), return_when=asyncio.FIRST_COMPLETED
+        )
+    finally:
+        watcher.cancel()
+    if task in done:
+        return task.result(), "ok"
+    task.cancel()
+    if watcher in done:
+        REQUEST_STATS["cancelled"] += 1
+        print("Client disconnected; cancelled request")
+        return None, "cancelled"
+    REQUEST_STATS["deadline_exceeded"] += 1
+    print(f"Request exceeded its {deadline.seconds}s deadline")
+    return None, "deadline"
+
+async def iterate_with_deadline(agen, deadline: Deadline):
+    """
+    Yield items from an async generator until it finishes or the deadline
+    passes; in the latter case the generator is closed and DEADLINE is
+    yielded last.
+    """
+    while True:
+        try:
+            item = await asyncio.wait_for(agen.__anext__(), timeout=deadline.remaining())
+        except StopAsyncIteration:
+            return
+        except asyncio.TimeoutError:
+            await agen.aclose()
+            REQUEST_STATS["deadline_exceeded"] += 1
+            print(f"Stream exceeded its {deadline.seconds}s deadline")
+            yield DEADLINE
+            return
+        yield item
+
+def record_stream_cancelled():
+    REQUEST_STATS["cancelled"] += 1
+
+def request_stats():
+    return dict(REQUEST_STATS)
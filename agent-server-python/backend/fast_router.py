@@ -0,0 +1,100 @@
+"""
+Local, rule-based routing tier.
+
+Scores a message against the goal category keyword table and the common
+emotion list with a single precompiled regex pass. Confident results skip the
+LLM router entirely; everything else falls back to it.
+"""
+import re
+from collections import defaultdict
+from backend.goal_extraction import CATEGORY_KEYWORDS
+from backend.mood_extraction import COMMON_EMOTIONS
+
+# Vocabulary on top of the shared tables that is common in chat openers but
+# would be too loose for goal categorisation.
+EXTRA_ROUTE_KEYWORDS = {
+    "physical": ["running", "jog", "jogging", "steps", "eat", "eating", "healthy", "tired", "energy", "body"],
+    "mental": ["anxious", "stressed", "therapist", "panic", "overthinking", "burnout"],
+    "spiritual": ["prayer", "god", "church", "mosque", "temple", "gratitude practice"],
+    "financial": ["savings", "spending", "loan", "rent", "bills", "paycheck", "credit card"],
+    "social": ["friend", "partner", "lonely", "loneliness", "dating", "coworkers"],
+    "intellectual": ["reading", "books", "learning", "language", "podcast", "curious"],
+    "vocational": ["boss", "manager", "office", "workplace", "hired", "fired", "salary"],
+    "environmental": ["declutter", "clutter", "plastic", "waste", "garden", "compost"],
+}
+
+# Everyday words that show up just as often outside their domain ("how does
+# this work?", "I hope you're well", "tell me a joke about a book"). They
+# count as half a hit, so one of them alone never routes a message locally.
+WEAK_ROUTE_KEYWORDS = {
+    "lose", "gain", "run", "walk", "water", "drink", "rest", "eat", "eating", "healthy",
+    "tired", "energy", "body", "mood", "emotional", "purpose", "meaning", "soul", "save",
+    "income", "expense", "rent", "bills", "friends", "friend", "family", "partner",
+    "network", "community", "connect", "communication", "read", "learn", "course", "book",
+    "books", "reading", "learning", "skill", "knowledge", "write", "research", "language",
+    "curious", "work", "job", "business", "office", "hired", "fired", "green", "eco",
+    "nature", "waste", "garden", "hope", "content", "connected", "relief", "happy", "sad",
+    "angry", "excited", "calm", "envy", "disappointed", "grateful", "drained",
+}
+
+# Emotion words point at the mental health coach.
+EMOTION_ROUTE = "mental"
+
+def _build_keyword_routes():
+    keyword_routes = defaultdict(set)
+    # The bare route name, e.g. a user answering "physical" to the category
+    # clarification question.
+    for route in CATEGORY_KEYWORDS:
+        keyword_routes[route].add(route)
+    for route, keywords in CATEGORY_KEYWORDS.items():
+        for kw in keywords:
+            keyword_routes[kw].add(route)
+    for route, keywords in EXTRA_ROUTE_KEYWORDS.items():
+        for kw in keywords:
+            keyword_routes[kw].add(route)
+    for emotion in COMMON_EMOTIONS:
+        keyword_routes[emotion].add(EMOTION_ROUTE)
+    return dict(keyword_routes)
+
+_KEYWORD_ROUTES = _build_keyword_routes()
+
+# Longest keywords first so multi-word phrases win over their prefixes.
+_KEYWORD_PATTERN = re.compile(
+    r"\b(" + "|".join(
+        re.escape(kw) for kw in sorted(_KEYWORD_ROUTES, key=len, reverse=True)
+    ) + r")(?:s|es)?\b",
+    re.IGNORECASE,
+)
+
+ROUTER_STATS = {"local": 0, "fallback": 0}
+
+def classify(user_message: str):
+    """
+    Return (route, confidence) for a message.
+
+    Confidence is the winning route's share of all keyword hits, scaled by
+    how much evidence backs it: one specific keyword gives 0.75, one
+    everyday word (WEAK_ROUTE_KEYWORDS) only 0.5, so a lone incidental
+    "save" or "work" falls back to the LLM router. No hits gives ("main", 0.0).
+    """
+    scores = defaultdict(float)
+    for match in _KEYWORD_PATTERN.finditer(user_message):
+        keyword = match.group(1).lower()
+        routes = _KEYWORD_ROUTES[keyword]
+        weight = 0.5 if keyword in WEAK_ROUTE_KEYWORDS else 1.0
+        for route in routes:
+            scores[route] += weight / len(routes)
+    if not scores:
+        return "main", 0.0
+    route, top = max(scores.items(), key=lambda item: item[1])
+    share = top / sum(scores.values())
+    coverage = min(1.0, 0.25 + 0.5 * top)
+    return route, round(share * coverage, 3)
+
+def router_stats():
+    total = ROUTER_STATS["local"] + ROUTER_STATS["fallback"]
+    return {
+        **ROUTER_STATS,
+        "local_hit_rate": ROUTER_STATS["local"] / total if total else 0.0,
+        "fallback_rate": ROUTER_STATS["fallback"] / total if total else 0.0,
+    }
@@ -0,0 +1,17 @@
+import threading
+from google.cloud import firestore
+
+_db = None
+_lock = threading.Lock()
+
+def get_db() -> firestore.Client:
+    """
+    Process-wide Firestore client. One client means one set of credentials
+    and one pooled gRPC channel shared by every caller.
+    """
+    global _db
+    if _db is None:
+        with _lock:
+            if _db is None:
+                _db = firestore.Client()
+    return _db
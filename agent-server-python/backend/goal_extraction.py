@@ -1,7 +1,51 @@
 import re
 from backend.config import gpt4o
+from backend.keyword_matcher import KeywordMatcher
+from backend.metrics import model_span
 
-async def extract_goal_details(user_message: str, conversation_history: list = None) -> dict:
+CATEGORY_KEYWORDS = {
+    "physical": ["exercise", "workout", "fitness", "weight", "lose", "gain", "run", "walk", "swim", "gym", "strength", "cardio", "nutrition", "diet", "water", "drink", "hydrate", "sleep", "rest"],
+    "mental": ["stress", "anxiety", "meditation", "mindfulness", "therapy", "mental health", "depression", "mood", "emotional", "journal", "gratitude"],
+    "spiritual": ["meditate", "pray", "spiritual", "faith", "religion", "mindfulness", "purpose", "meaning", "soul", "inner peace"],
+    "financial": ["save", "budget", "money", "invest", "debt", "financial", "income", "expense", "retirement", "emergency fund"],
+    "social": ["friends", "family", "social", "relationship", "network", "community", "volunteer", "connect", "communication"],
+    "intellectual": ["read", "learn", "study", "course", "book", "skill", "knowledge", "education", "research", "write"],
+    "vocational": ["career", "job", "work", "professional", "promotion", "skill", "certification", "resume", "interview", "business"],
+    "environmental": ["environment", "green", "eco", "sustainable", "recycle", "nature", "climate", "pollution", "conservation"]
+}
+
+TIMEFRAME_KEYWORDS = {
+    "Week": ["week", "weekly", "7 days"],
+    "Month": ["month", "monthly", "30 days"],
+    "Quarter": ["quarter", "quarterly", "3 months"],
+    "Year": ["year", "yearly", "annual", "12 months"]
+}
+
+CATEGORY_MATCHER = KeywordMatcher(CATEGORY_KEYWORDS, inflect=True)
+TIMEFRAME_MATCHER = KeywordMatcher(TIMEFRAME_KEYWORDS, inflect=True)
+
+_DURATION_PATTERN = re.compile(r'(\d+)\s*(week|month|day)s?\b')
+GOAL_NAME_PATTERN = re.compile("|".join([
+    r'\b(?:goal|want|need|plan) (?:to|is to) (.+?)(?:\.|,|$)',
+    r'\bi want to (.+?)(?:\.|,|$)',
+    r'\bhelp me (?:to )?(.+?)(?:\.|,|$)',
+    r'\bset a goal (?:to )?(.+?)(?:\.|,|$)',
+    r'\bmy goal is (?:to )?(.+?)(?:\.|,|$)',
+    r'\badd (.+?) to my goals?',
+    r'\bcan you add (.+?) to my goals?'
+]))
+_WHITESPACE = re.compile(r'\s+')
+
+def find_goal_name(user_message: str):
+    """The goal name the rules can read from a message, or None."""
+    match = GOAL_NAME_PATTERN.search(user_message.lower())
+    if not match:
+        return None
+    goal_name = next(group for group in match.groups() if group is not None).strip()
+    return _WHITESPACE.sub(' ', goal_name)[:50]
+
+def parse_goal_details(user_message: str) -> dict:
+    """Rule-based goal fields; no model calls."""
     details = {
         "goal_name": None,
         "goal_description": None,
@@ -12,17 +56,10 @@ async def extract_goal_details(user_message: str, conversation_history: list = N
         "missing_fields": []
     }
     message_lower = user_message.lower()
-    timeframe_patterns = {
-        "week": ["week", "weekly", "7 days"],
-        "month": ["month", "monthly", "30 days"],
-        "quarter": ["quarter", "quarterly", "3 months"],
-        "year": ["year", "yearly", "annual", "12 months"]
-    }
-    for timeframe, patterns in timeframe_patterns.items():
-        if any(pattern in message_lower for pattern in patterns):
-            details["timeframe"] = timeframe.capitalize()
-            break
-    duration_match = re.search(r'(\d+)\s*(week|month|day)s?', message_lower)
+    timeframe = TIMEFRAME_MATCHER.first(message_lower)
+    if timeframe:
+        details["timeframe"] = timeframe
+    duration_match = _DURATION_PATTERN.search(message_lower)
     if duration_match:
         num, unit = duration_match.groups()
         if unit == "week":
@@ -31,51 +68,47 @@ async def extract_goal_details(user_message: str, conversation_history: list = N
             details["duration_weeks"] = int(num) * 4
         elif unit == "day":
             details["duration_weeks"] = max(1, int(num) // 7)
-    goal_name_patterns = [
-        r'(?:goal|want|need|plan) (?:to|is to) (.+?)(?:\.|,|$)',
-        r'i want to (.+?)(?:\.|,|$)',
-        r'help me (?:to )?(.+?)(?:\.|,|$)',
-        r'set a goal (?:to )?(.+?)(?:\.|,|$)',
-        r'my goal is (?:to )?(.+?)(?:\.|,|$)',
-        r'add (.+?) to my goals?',
-        r'can you add (.+?) to my goals?'
-    ]
-    for pattern in goal_name_patterns:
-        match = re.search(pattern, message_lower)
-        if match:
-            goal_name = match.group(1).strip()
-            goal_name = re.sub(r'\s+', ' ', goal_name)
-            details["goal_name"] = goal_name[:50]
-            details["goal_description"] = user_message.strip()
-            break
+    goal_name = find_goal_name(message_lower)
+    if goal_name:
+        details["goal_name"] = goal_name
+        details["goal_description"] = user_message.strip()
+    details["category_slug"] = CATEGORY_MATCHER.first(message_lower)
+    return details
+
+async def extract_goal_details(user_message: str, conversation_history: list = None) -> dict:
+    details = parse_goal_details(user_message)
     # LLM fallback for goal name
     if not details["goal_name"]:
-        llm_title = await gpt4o.ainvoke([
-            {
-                "role": "system",
-                "content": "Return a concise (≤50 chars) goal title:"
-            },
-            {
-                "role": "user",
-                "content": user_message
-            }
-        ])
+        with model_span(gpt4o.model_name, "goal_title") as call:
+            llm_title = await gpt4o.ainvoke([
+                {
+                    "role": "system",
+                    "content": "Return a concise (≤50 chars) goal title:"
+                },
+                {
+                    "role": "user",
+                    "content": user_message
+                }
+            ])
+            call.record(llm_title)
         details["goal_name"] = llm_title.content.strip()[:50]
-    category_keywords = {
-        "physical": ["exercise", "workout", "fitness", "weight", "lose", "gain", "run", "walk", "swim", "gym", "strength", "cardio", "nutrition", "diet", "water", "drink", "hydrate", "sleep", "rest"],
-        "mental": ["stress", "anxiety", "meditation", "mindfulness", "therapy", "mental health", "depression", "mood", "emotional", "journal", "gratitude"],
-        "spiritual": ["meditate", "pray", "spiritual", "faith", "religion", "mindfulness", "purpose", "meaning", "soul", "inner peace"],
-        "financial": ["save", "budget", "money", "invest", "debt", "financial", "income", "expense", "retirement", "emergency fund"],
-        "social": ["friends", "family", "social", "relationship", "network", "community", "volunteer", "connect", "communication"],
-        "intellectual": ["read", "learn", "study", "course", "book", "skill", "knowledge", "education", "research", "write"],
-        "vocational": ["career", "job", "work", "professional", "promotion", "skill", "certification", "resume", "interview", "business"],
-        "environmental": ["environment", "green", "eco", "sustainable", "recycle", "nature", "climate", "pollution", "conservation"]
-    }
-    if not details["category_slug"]:
-        for category, keywords in category_keywords.items():
-            if any(keyword in message_lower for keyword in keywords):
-                details["category_slug"] = category
-                break
+    return _with_missing_fields(details)
+
+def goal_details_from(user_message: str, fields: dict) -> dict:
+    """
+    Goal details from already extracted fields (the preflight call), with
+    the rule-based parse filling in anything left empty. No model calls.
+    """
+    details = parse_goal_details(user_message)
+    for key in ("goal_name", "category_slug", "timeframe", "duration_weeks"):
+        if fields.get(key):
+            details[key] = fields[key]
+    if details["goal_name"]:
+        details["goal_name"] = details["goal_name"][:50]
+        details["goal_description"] = details["goal_description"] or user_message.strip()
+    return _with_missing_fields(details)
+
+def _with_missing_fields(details: dict) -> dict:
     required_fields = ["goal_name", "category_slug"]
     for field in required_fields:
         if not details[field]:
@@ -0,0 +1,275 @@
+"""
+Write-behind queue for goal creation.
+
+add_goal spools the goal to a local SQLite file and returns straight away. A
+background thread commits spooled goals to Firestore in batched writes,
+retrying failed batches with exponential backoff. Each goal's document ID is
+its idempotency key, so a repeated tool call or a retried batch overwrites
+the same document instead of creating a duplicate. Anything still spooled
+when the process dies is picked up on the next start.
+"""
+import hashlib
+import json
+import random
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from backend.config import (
+    GOAL_QUEUE_SPOOL_PATH,
+    GOAL_QUEUE_BATCH_SIZE,
+    GOAL_QUEUE_FLUSH_MS,
+    GOAL_QUEUE_MAX_ATTEMPTS,
+    GOAL_QUEUE_BACKOFF_BASE_SECONDS,
+    GOAL_QUEUE_BACKOFF_MAX_SECONDS,
+)
+from backend.firestore_client import get_db
+
+# Firestore caps a batched write at 500 operations
+FIRESTORE_BATCH_LIMIT = 500
+# Keys embed the UTC day, so written markers older than this can never match
+_WRITTEN_RETENTION_SECONDS = 2 * 86400
+_DATETIME_FIELDS = ("startDate", "endDate")
+
+def idempotency_key(user_id, goal_name, category_slug, timeframe, day):
+    """
+    Same user, goal name, category and timeframe on the same UTC day is the
+    same goal; a model that repeats its add_goal call lands on one document.
+    """
+    normalized = " ".join(str(goal_name).lower().split())
+    raw = "|".join([str(user_id), normalized, str(category_slug), str(timeframe), day])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+def _encode(goal):
+    return json.dumps({
+        k: v.isoformat() if isinstance(v, datetime) else v
+        for k, v in goal.items()
+    })
+
+def _decode(payload):
+    goal = json.loads(payload)
+    for field in _DATETIME_FIELDS:
+        if isinstance(goal.get(field), str):
+            goal[field] = datetime.fromisoformat(goal[field])
+    return goal
+
+
+class GoalWriteQueue:
+    def __init__(self, spool_path, batch_size=50, flush_ms=200.0, max_attempts=8,
+                 backoff_base=0.5, backoff_max=60.0, window=200):
+        self.spool_path = spool_path
+        self.batch_size = min(batch_size, FIRESTORE_BATCH_LIMIT)
+        self.flush_interval = flush_ms / 1000
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._conn = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._stopping = False
+        self._flush_ms = deque(maxlen=window)
+        self._pruned_at = 0.0
+        self.enqueued = 0
+        self.duplicates = 0
+        self.written = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.dead_lettered = 0
+
+    def _db(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.spool_path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS goals ("
+                " key TEXT PRIMARY KEY,"
+                " user_id TEXT NOT NULL,"
+                " payload TEXT NOT NULL,"
+                " state TEXT NOT NULL DEFAULT 'pending',"  # pending | written | dead
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " next_attempt REAL NOT NULL,"
+                " created REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS goals_due ON goals (state, next_attempt)")
+            self._conn = conn
+        return self._conn
+
+    def start(self):
+        """Start the flusher; also drains whatever a previous process left spooled."""
+        with self._lock:
+            self._db()
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="goal-queue", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Flush what is due and stop the flusher. Undelivered goals stay spooled."""
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def enqueue(self, key, user_id, goal):
+        """
+        Durably spool a goal. Returns False when the key is already known,
+        i.e. the goal is pending or was written before.
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._db().execute(
+                "INSERT OR IGNORE INTO goals (key, user_id, payload, next_attempt, created)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, user_id, _encode(goal), now, now),
+            )
+            inserted = cursor.rowcount == 1
+        if inserted:
+            self.enqueued += 1
+        else:
+            self.duplicates += 1
+        self.start()
+        self._wake.set()
+        return inserted
+
+    def pending_for(self, user_id):
+        """Goals spooled for a user but not yet committed, as returned by add_goal."""
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT key, payload FROM goals WHERE user_id = ? AND state = 'pending' ORDER BY created",
+                (user_id,),
+            ).fetchall()
+        return [{**_decode(payload), "id": key} for key, payload in rows]
+
+    def _due(self):
+        with self._lock:
+            return self._db().execute(
+                "SELECT key, payload, attempts FROM goals"
+                " WHERE state = 'pending' AND next_attempt <= ? ORDER BY created LIMIT ?",
+                (time.time(), self.batch_size),
+            ).fetchall()
+
+    def _backoff(self, attempts):
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempts - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def flush_once(self):
+        """Commit one batch of due goals. Returns how many were written."""
+        rows = self._due()
+        if not rows:
+            return 0
+        start = time.perf_counter()
+        try:
+            db = get_db()
+            batch = db.batch()
+            for key, payload, _ in rows:
+                batch.set(db.collection("goals").document(key), _decode(payload))
+            batch.commit()
+        except Exception as e:
+            self.failed_flushes += 1
+            print(f"Goal queue flush failed ({len(rows)} goals): {e}")
+            now = time.time()
+            with self._lock:
+                for key, _, attempts in rows:
+                    attempts += 1
+                    if attempts >= self.max_attempts:
+                        self.dead_lettered += 1
+                        print(f"Goal {key} dead-lettered after {attempts} attempts")
+                        self._db().execute(
+                            "UPDATE goals SET state = 'dead', attempts = ? WHERE key = ?", (attempts, key)
+                        )
+                    else:
+                        self._db().execute(
+                            "UPDATE goals SET attempts = ?, next_attempt = ? WHERE key = ?",
+                            (attempts, now + self._backoff(attempts), key),
+                        )
+            return 0
+
+        self._flush_ms.append((time.perf_counter() - start) * 1000)
+        self.flushes += 1
+        self.written += len(rows)
+        with self._lock:
+            # Written keys are kept so later repeats are still recognized
+            self._db().executemany(
+                "UPDATE goals SET state = 'written', payload = '{}' WHERE key = ?",
+                [(key,) for key, _, _ in rows],
+            )
+        return len(rows)
+
+    def _next_due_in(self):
+        with self._lock:
+            row = self._db().execute(
+                "SELECT MIN(next_attempt) FROM goals WHERE state = 'pending'"
+            ).fetchone()
+        if row[0] is None:
+            return None
+        return max(0.0, row[0] - time.time())
+
+    def _prune(self):
+        now = time.time()
+        if now - self._pruned_at < 3600:
+            return
+        self._pruned_at = now
+        with self._lock:
+            self._db().execute(
+                "DELETE FROM goals WHERE state = 'written' AND created < ?",
+                (now - _WRITTEN_RETENTION_SECONDS,),
+            )
+
+    def _run(self):
+        while True:
+            try:
+                while self.flush_once() == self.batch_size:
+                    pass  # backlog: keep going without waiting
+                self._prune()
+                if self._stopping:
+                    return
+                wait = self._next_due_in()
+                # Coalesce goals arriving close together into one batch
+                self._wake.wait(None if wait is None else max(wait, self.flush_interval))
+                self._wake.clear()
+                if not self._stopping:
+                    time.sleep(self.flush_interval)
+            except Exception as e:
+                print(f"Goal queue error: {e}")
+                time.sleep(self.flush_interval)
+
+    def _percentile(self, q):
+        if not self._flush_ms:
+            return None
+        ordered = sorted(self._flush_ms)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._db().execute("SELECT state, COUNT(*) FROM goals GROUP BY state").fetchall())
+            oldest = self._db().execute(
+                "SELECT MIN(created) FROM goals WHERE state = 'pending'"
+            ).fetchone()[0]
+        return {
+            "depth": counts.get("pending", 0),
+            "dead": counts.get("dead", 0),
+            "oldest_pending_seconds": time.time() - oldest if oldest else 0.0,
+            "enqueued": self.enqueued,
+            "duplicates": self.duplicates,
+            "written": self.written,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "dead_lettered": self.dead_lettered,
+            "flush_p50_ms": self._percentile(0.5),
+            "flush_p95_ms": self._percentile(0.95),
+        }
+
+
+goal_queue = GoalWriteQueue(
+    GOAL_QUEUE_SPOOL_PATH,
+    batch_size=GOAL_QUEUE_BATCH_SIZE,
+    flush_ms=GOAL_QUEUE_FLUSH_MS,
+    max_attempts=GOAL_QUEUE_MAX_ATTEMPTS,
+    backoff_base=GOAL_QUEUE_BACKOFF_BASE_SECONDS,
+    backoff_max=GOAL_QUEUE_BACKOFF_MAX_SECONDS,
+)
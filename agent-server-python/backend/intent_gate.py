@@ -0,0 +1,60 @@
+"""
+Local goal-intent gate in front of goal extraction.
+
+Decides from the wording alone whether a message is asking to set a goal.
+Clear cases never reach a model; only aspirational wording without an
+explicit goal cue ("can you help me sleep better?") is left undecided for
+the LLM fallback.
+"""
+import re
+from backend.goal_extraction import CATEGORY_MATCHER, GOAL_NAME_PATTERN
+
+# Wording that only shows up when someone is setting or managing a goal
+_EXPLICIT_GOAL = re.compile(
+    r"\b(?:goals?|resolutions?|new habit|habit of|set a target|track my progress|"
+    r"commit(?:ting)? to|remind me to|hold me accountable)\b"
+)
+# Wording that expresses wanting a change, goal or not
+_ASPIRATION = re.compile(
+    r"\b(?:i want to|i wanna|i'd like to|i would like to|i need to|i plan to|i'm planning to|"
+    r"i'm going to|i am going to|i will|i'll start|i'm trying to|i am trying to|help me|"
+    r"get better at|improve my)\b"
+)
+_QUESTION_OPENER = re.compile(r"^(?:how|what|why|when|where|which|who|is|are|do|does|can|could|should|would)\b")
+
+INTENT_STATS = {
+    "checked": 0,       # every message that used to go through extraction
+    "local_goal": 0,
+    "local_other": 0,
+    "llm_goal": 0,
+    "llm_other": 0,
+    "extractions": 0,   # messages that went through extraction
+    "title_llm_calls": 0,
+}
+
+def goal_intent(user_message: str):
+    """
+    Return (is_goal, confidence). is_goal is None when the wording is
+    aspirational but ambiguous and a model should decide.
+    """
+    text = user_message.strip().lower()
+    if not text:
+        return False, 1.0
+    if _EXPLICIT_GOAL.search(text):
+        return True, 0.95
+    if not (_ASPIRATION.search(text) or GOAL_NAME_PATTERN.search(text)):
+        # Feelings, questions and small talk: "I feel sad today"
+        return False, 0.9
+    is_question = text.endswith("?") or _QUESTION_OPENER.match(text) is not None
+    if CATEGORY_MATCHER.first(text) and not is_question:
+        # "I want to run a 5k in 8 weeks"
+        return True, 0.75
+    return None, 0.5
+
+def intent_stats():
+    checked = INTENT_STATS["checked"]
+    return {
+        **INTENT_STATS,
+        "extraction_rate": INTENT_STATS["extractions"] / checked if checked else 0.0,
+        "llm_fallback_rate": (INTENT_STATS["llm_goal"] + INTENT_STATS["llm_other"]) / checked if checked else 0.0,
+    }
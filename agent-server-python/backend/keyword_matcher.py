@@ -0,0 +1,105 @@
+"""
+Single-pass keyword matching over label -> keywords tables.
+
+All keywords of a table are compiled once into a single word-bounded regex,
+factored into a prefix trie so the engine never retries shared prefixes. A
+message is scanned once however large the table is, and "work" no longer
+matches inside "homework".
+"""
+import re
+
+_VOWELS = set("aeiou")
+
+def inflections(keyword):
+    """
+    The keyword plus its regular English inflections (plural, -ed, -ing,
+    -er), so whole-word matching still finds "running" for "run" and
+    "saving" for "save". Multi-word phrases only get a plural.
+    """
+    forms = {keyword}
+    if " " in keyword or not keyword.isalpha():
+        if not keyword.endswith("s"):
+            forms.add(keyword + "s")
+        return forms
+    if len(keyword) < 3 or keyword.endswith("ly"):
+        return forms
+    forms.update({keyword + "s", keyword + "es", keyword + "ed", keyword + "ing", keyword + "er", keyword + "ers"})
+    if keyword.endswith("e"):
+        stem = keyword[:-1]
+        forms.update({keyword + "d", keyword + "r", keyword + "rs", stem + "ing"})
+    elif (keyword[-1] not in _VOWELS and keyword[-1] not in "wxy"
+          and keyword[-2] in _VOWELS and keyword[-3] not in _VOWELS):
+        # Consonant-vowel-consonant endings double: run -> running, swim -> swimmer
+        doubled = keyword + keyword[-1]
+        forms.update({doubled + "ing", doubled + "ed", doubled + "er", doubled + "ers"})
+    return forms
+
+
+def _trie_pattern(forms):
+    trie = {}
+    for form in forms:
+        node = trie
+        for ch in form:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def emit(node):
+        branches = [
+            (r"\s+" if ch == " " else re.escape(ch)) + emit(child)
+            for ch, child in sorted(node.items()) if ch
+        ]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # A keyword ending here: the longer continuations are optional (greedy)
+        return "(?:" + body + ")?" if "" in node else body
+
+    return emit(trie)
+
+
+class KeywordMatcher:
+    """
+    Matches a {label: [keyword, ...]} table in one regex pass. A keyword
+    listed under several labels counts for each of them; table order is the
+    label priority used by first().
+    """
+
+    def __init__(self, table, inflect=False):
+        self._rank = {label: i for i, label in enumerate(table)}
+        self._labels = {}  # surface form -> labels, in table order
+        for label, keywords in table.items():
+            for keyword in keywords:
+                for form in inflections(keyword) if inflect else {keyword}:
+                    labels = self._labels.setdefault(" ".join(form.lower().split()), [])
+                    if label not in labels:
+                        labels.append(label)
+        # Matched against lowercased text: cheaper than re.IGNORECASE
+        self.pattern = re.compile(r"\b(?:" + _trie_pattern(self._labels) + r")\b")
+
+    def _lookup(self, match):
+        labels = self._labels.get(match)
+        if labels is None:
+            # Phrase matched across other whitespace than a single space
+            labels = self._labels[" ".join(match.split())]
+        return labels
+
+    def findall(self, text):
+        """Every (matched lowercased text, labels) pair, left to right, longest phrase first."""
+        return [(match, self._lookup(match)) for match in self.pattern.findall(text.lower())]
+
+    def labels(self, text):
+        """Matched labels in order of first appearance."""
+        found = {}
+        for match in self.pattern.findall(text.lower()):
+            for label in self._lookup(match):
+                found.setdefault(label)
+        return list(found)
+
+    def first(self, text):
+        """The highest-priority matched label, or None."""
+        best = None
+        for match in self.pattern.findall(text.lower()):
+            for label in self._lookup(match):
+                if best is None or self._rank[label] < self._rank[best]:
+                    best = label
+        return best
@@ -3,16 +3,73 @@ from backend.config import (
     gpt4o_mini_with_tools,
     gpt4o_with_tools,
     deepseek_with_tools,
-    
+    summary_model,
+    embeddings,
+    FAST_ROUTER_ENABLED,
+    FAST_ROUTER_MIN_CONFIDENCE,
+    GOAL_INTENT_GATE_ENABLED,
+    GOAL_INTENT_LLM_FALLBACK,
+    PREFLIGHT_ENABLED,
+    RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_SEMANTIC,
+    RESPONSE_CACHE_TTL,
+    RESPONSE_CACHE_SIZE,
+    RESPONSE_CACHE_THRESHOLD,
+    PROMPT_TOKEN_BUDGET,
+    HISTORY_SUMMARY_ENABLED,
+    HISTORY_SUMMARY_CHUNK,
+    CONTEXT_MAX_GOALS,
+    CONTEXT_MAX_MOODS,
+    PERSONA_MODEL_ORDER,
+    MODEL_HEDGING_ENABLED,
+    MODEL_HEDGE_DEFAULT_MS,
+    MODEL_BREAKER_FAILURES,
+    MODEL_BREAKER_COOLDOWN_SECONDS,
+    SUMMARY_BATCH_CONCURRENCY,
+    SUMMARY_CACHE_TTL,
+    SUMMARY_CACHE_SIZE,
 )
-from backend.goal_extraction import extract_goal_details, generate_confirmation_prompt
+import asyncio
+import json
+import hashlib
+from backend import fast_router
+from backend.intent_gate import goal_intent, INTENT_STATS
+from backend.cache import TTLCache
+from backend.response_cache import ResponseCache
+from backend.model_pool import ModelBackend, ModelPool
+import time
+from backend.token_budget import count_message_tokens, prompt_budget, fit_history, record_prompt_tokens, record_usage
+from backend.goal_extraction import extract_goal_details, goal_details_from, generate_confirmation_prompt, find_goal_name
+from backend.preflight import run_preflight
 from backend.prompts.personas import PERSONA_PROMPTS
-from tools.goal_tools import add_goal_tool, list_goal_categories
+from backend.tool_runner import execute_tool_calls, iter_tool_results
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage, ToolMessage
 from backend.rag_utils import format_profile_goals_and_moods
-from langsmith import traceable
+from backend.metrics import span, model_span, record_model_call
+from backend.tracing import traced, annotate_run
 
 
+response_cache = ResponseCache(
+    ttl=RESPONSE_CACHE_TTL if RESPONSE_CACHE_ENABLED else 0,
+    maxsize=RESPONSE_CACHE_SIZE,
+    threshold=RESPONSE_CACHE_THRESHOLD,
+    embed=embeddings.aembed_query if RESPONSE_CACHE_SEMANTIC else None,
+)
+
+summary_cache = TTLCache(ttl=SUMMARY_CACHE_TTL, maxsize=SUMMARY_CACHE_SIZE)
+
+async def cached_reply(agent_type, history, user_data):
+    """
+    Look up a cached reply. Returns (reply or None, probe); probe is None when
+    the cache is off or bypassed because the turn carries user context.
+    """
+    if not response_cache.enabled or not history:
+        return None, None
+    if user_data:
+        response_cache.bypass()
+        return None, None
+    return await response_cache.lookup(agent_type, history)
+
 def sanitize_history(history):
     sanitized = []
     for h in history:
@@ -23,6 +80,45 @@ def sanitize_history(history):
     return sanitized
 
 async def route_message(user_message: str):
+    if FAST_ROUTER_ENABLED:
+        route, confidence = fast_router.classify(user_message)
+        if confidence >= FAST_ROUTER_MIN_CONFIDENCE:
+            fast_router.ROUTER_STATS["local"] += 1
+            return route
+        fast_router.ROUTER_STATS["fallback"] += 1
+    return await llm_route(user_message)
+
+async def route_turn(user_message: str):
+    """
+    Route a turn. Returns (route, preflight); preflight is the structured
+    triage result when PREFLIGHT_ENABLED and the call succeeded, else None.
+
+    The preflight call only replaces model calls: when the local router is
+    confident and the turn is either not a goal or a goal whose name the
+    rules can parse, the turn needs none.
+    """
+    if PREFLIGHT_ENABLED:
+        if FAST_ROUTER_ENABLED:
+            route, confidence = fast_router.classify(user_message)
+            if confidence >= FAST_ROUTER_MIN_CONFIDENCE and _handled_locally(user_message):
+                fast_router.ROUTER_STATS["local"] += 1
+                return route, None
+            fast_router.ROUTER_STATS["fallback"] += 1
+        result = await run_preflight(user_message)
+        if result is not None:
+            return result.route, result
+        return await llm_route(user_message), None
+    return await route_message(user_message), None
+
+def _handled_locally(user_message: str):
+    """True when goal handling for this message makes no model call."""
+    is_goal, _ = goal_intent(user_message)
+    if is_goal is None:
+        return False
+    # A goal without a parseable name would need the gpt-4o title call
+    return not is_goal or find_goal_name(user_message) is not None
+
+async def llm_route(user_message: str):
     system = (
         "You are a routing assistant for a wellness chatbot. "
         "Given a user's message, decide which wellness domain it best fits. "
@@ -31,10 +127,12 @@ async def route_message(user_message: str):
         " If it does not fit any, reply with 'main'."
     )
     try:
-        routing_response = await gpt4o_mini.ainvoke([
-            SystemMessage(content=system),
-            HumanMessage(content=user_message),
-        ])
+        with model_span(gpt4o_mini.model_name, "route") as call:
+            routing_response = await gpt4o_mini.ainvoke([
+                SystemMessage(content=system),
+                HumanMessage(content=user_message),
+            ])
+            call.record(routing_response)
         route = routing_response.content.strip().lower()
         allowed = [
             "mental", "physical", "spiritual", "vocational", 
@@ -45,40 +143,52 @@ async def route_message(user_message: str):
         print(f"Routing error: {e}")
         return "main"
 
-async def execute_tool_call(tool_call, user_id):
-    tool_name = tool_call["name"]
-    tool_args = tool_call["args"]
-    if user_id:
-        tool_args["user_id"] = user_id  
+async def llm_goal_intent(user_message: str):
+    system = (
+        "You are a classifier for a wellness chatbot. Decide whether the user is asking "
+        "to set, create or add a personal goal. Reply with only 'goal' or 'other'."
+    )
     try:
-        if tool_name in ("add_goal", "add_goal_tool"):
-            return add_goal_tool.invoke(tool_args)
-        elif tool_name == "list_goal_categories":
-            return list_goal_categories.invoke(tool_args)
-        else:
-            return {"error": f"Unknown tool: {tool_name}"}
+        with model_span(gpt4o_mini.model_name, "goal_intent") as call:
+            response = await gpt4o_mini.ainvoke([
+                SystemMessage(content=system),
+                HumanMessage(content=user_message),
+            ])
+            call.record(response)
+        return response.content.strip().lower().startswith("goal")
     except Exception as e:
-        print(f"Tool execution error: {e}")
-        import traceback; traceback.print_exc()
-        return {"error": str(e)}
+        print(f"Goal intent error: {e}")
+        return False
 
-@traceable(tags=["persona", "tabi_chat"], metadata={"component": "persona_router"})
-async def get_reply(agent_type, history, user_data=None, user_id=None):
-    print(f"Getting reply for agent_type: {agent_type}, user_id: {user_id}")
-    from langsmith.run_helpers import get_current_run_tree
-    try:
-        current_run = get_current_run_tree()
-        if current_run:
-            current_run.name = f"Persona: {agent_type}"
-            current_run.metadata.update({
-                "persona_type": agent_type,
-                "user_id": user_id,
-                "has_user_data": bool(user_data)
-            })
-    except:
-        pass
-    
-     # ---- BEGIN: Inserted Goal Clarification Logic ----
+async def is_goal_request(user_message: str):
+    """Local goal-intent gate, with a gpt-4o-mini call only for ambiguous wording."""
+    INTENT_STATS["checked"] += 1
+    if not GOAL_INTENT_GATE_ENABLED:
+        return True
+    is_goal, _ = goal_intent(user_message)
+    if is_goal is not None:
+        INTENT_STATS["local_goal" if is_goal else "local_other"] += 1
+        return is_goal
+    if not GOAL_INTENT_LLM_FALLBACK:
+        # Without a model to ask, keep the old behaviour
+        INTENT_STATS["local_goal"] += 1
+        return True
+    is_goal = await llm_goal_intent(user_message)
+    INTENT_STATS["llm_goal" if is_goal else "llm_other"] += 1
+    return is_goal
+
+async def _extract_goal_details(user_message, history):
+    if not find_goal_name(user_message):
+        # extract_goal_details asks gpt-4o for a title
+        INTENT_STATS["title_llm_calls"] += 1
+    return await extract_goal_details(user_message, history)
+
+async def goal_clarification(agent_type, history, preflight=None):
+    """
+    Return a clarifying question when the latest turn looks like an incomplete
+    goal request, otherwise None. With a preflight result its intent and goal
+    fields are used instead of the intent gate and extraction calls.
+    """
     CLARIFY_FIRST = {"physical", "mental", "spiritual", "social", "financial", "intellectual", "vocational", "environmental"}
 
     CATEGORY_OPTIONS = [
@@ -96,7 +206,9 @@ async def get_reply(agent_type, history, user_data=None, user_id=None):
                     prev_goal_msg = msg["content"]
                     break
             # 2. Extract all details from previous message, then set the selected category
-            details = await extract_goal_details(prev_goal_msg or "", history)
+            INTENT_STATS["extractions"] += 1
+            with span("goal_extraction"):
+                details = await _extract_goal_details(prev_goal_msg or "", history)
             details["category_slug"] = user_message
             if "category_slug" in details["missing_fields"]:
                 details["missing_fields"].remove("category_slug")
@@ -107,43 +219,181 @@ async def get_reply(agent_type, history, user_data=None, user_id=None):
                     return prompt
         else:
             # User gave a message, but it's not a recognized category
-            details = await extract_goal_details(user_message, history)
+            if preflight is not None:
+                INTENT_STATS["checked"] += 1
+                if preflight.intent != "goal":
+                    return None
+                fields = preflight.goal.model_dump() if preflight.goal else {}
+                INTENT_STATS["extractions"] += 1
+                with span("goal_extraction"):
+                    details = goal_details_from(user_message, fields)
+            elif await is_goal_request(user_message):
+                INTENT_STATS["extractions"] += 1
+                with span("goal_extraction"):
+                    details = await _extract_goal_details(user_message, history)
+            else:
+                return None
             if details["missing_fields"]:
                 prompt = generate_confirmation_prompt(details)
                 if prompt:
                     return prompt
+    return None
+
+# hash of summarized turns -> summary text
+_history_summaries = TTLCache(ttl=3600, maxsize=1024)
+
+def _turns_hash(turns):
+    digest = hashlib.sha1()
+    for h in turns:
+        digest.update(f"{h['role']}\x00{h['content']}\x01".encode())
+    return digest.hexdigest()
+
+async def summarize_history(turns, previous_summary=None):
+    """
+    Condense older turns into a short running summary, optionally extending
+    a previous summary of the turns before them.
+    """
+    lc_messages = [
+        SystemMessage(
+            content=(
+                "Summarize the conversation so far between a user and a wellness coach "
+                "in at most 5 short sentences. Keep goals, feelings, decisions and open "
+                "questions the user mentioned. Respond with only the summary."
+            )
+        )
+    ]
+    if previous_summary:
+        lc_messages.append(SystemMessage(content=f"Summary of earlier turns:\n{previous_summary}"))
+    for h in turns:
+        if h["role"] == "user":
+            lc_messages.append(HumanMessage(content=h["content"]))
+        else:
+            lc_messages.append(AIMessage(content=h["content"]))
+    with model_span(gpt4o_mini.model_name, "history_summary") as call:
+        response = await gpt4o_mini.ainvoke(lc_messages)
+        call.record(response)
+    return response.content.strip()
 
-    # ---- END: Inserted Goal Clarification Logic ----
+async def rolling_summary(turns):
+    """
+    Summary of `turns`, cached by content. When the summary of all but the
+    last HISTORY_SUMMARY_CHUNK turns is cached, only that chunk is summarized
+    on top of it.
+    """
+    key = _turns_hash(turns)
+    summary = _history_summaries.get(key)
+    if summary is not None:
+        return summary
+    prefix = turns[:-HISTORY_SUMMARY_CHUNK]
+    previous = _history_summaries.get(_turns_hash(prefix)) if prefix else None
+    try:
+        if previous is not None:
+            summary = await summarize_history(turns[len(prefix):], previous)
+        else:
+            summary = await summarize_history(turns)
+    except Exception as e:
+        print(f"History summary error: {e}")
+        return None
+    _history_summaries.set(key, summary)
+    return summary
 
+async def build_messages(agent_type, history, user_data=None, model_name="gpt-4o"):
+    """
+    Assemble the prompt within PROMPT_TOKEN_BUDGET: goals and moods are ranked
+    and capped, and turns that don't fit are replaced by a rolling summary
+    (or dropped when summaries are disabled).
+    """
     lc_messages = []
-    context_text = format_profile_goals_and_moods(user_data) if user_data else ""
+    query = history[-1]["content"] if history else None
+    context_text = format_profile_goals_and_moods(
+        user_data, query=query, max_goals=CONTEXT_MAX_GOALS, max_moods=CONTEXT_MAX_MOODS, route=agent_type
+    ) if user_data else ""
     persona_prompt = PERSONA_PROMPTS.get(agent_type, PERSONA_PROMPTS["main"])
-    lc_messages.append(SystemMessage(content=f"{context_text}\n{persona_prompt}"))
-    for h in history:
+    # The persona prompt goes first and byte-identical for every user so the
+    # provider's prompt-prefix cache can reuse it; per-user text comes after.
+    lc_messages.append(SystemMessage(content=persona_prompt))
+    if context_text:
+        lc_messages.append(SystemMessage(content=context_text))
+
+    budget = prompt_budget(model_name, PROMPT_TOKEN_BUDGET) - count_message_tokens(lc_messages, model_name)
+    dropped, kept = fit_history(history, budget, model_name)
+    if dropped and HISTORY_SUMMARY_ENABLED:
+        # Summarize in whole chunks so the summarized prefix, and therefore
+        # the cache key, only moves every HISTORY_SUMMARY_CHUNK turns.
+        chunks = -(-len(dropped) // HISTORY_SUMMARY_CHUNK)
+        cut = min(chunks * HISTORY_SUMMARY_CHUNK, len(history) - 1)
+        summary = await rolling_summary(history[:cut])
+        kept = history[cut:]
+        if summary:
+            lc_messages.append(SystemMessage(content=f"Summary of the earlier conversation:\n{summary}"))
+    for h in kept:
         if h["role"] == "user":
             lc_messages.append(HumanMessage(content=h["content"]))
         else:
             lc_messages.append(AIMessage(content=h["content"]))
 
-    model_router = {
-        "physical": deepseek_with_tools,
-        "mental": gpt4o_with_tools,
-        "spiritual": gpt4o_with_tools,
-        "vocational": gpt4o_with_tools,
-        "environmental": deepseek_with_tools,
-        "financial": gpt4o_with_tools,
-        "social": gpt4o_with_tools,
-        "intellectual": gpt4o_with_tools,
-        "main": gpt4o_mini_with_tools,
+    prompt_tokens = count_message_tokens(lc_messages, model_name)
+    record_prompt_tokens(model_name, prompt_tokens)
+    print(f"Prompt tokens ({model_name}): {prompt_tokens}, turns kept: {len(kept)}/{len(history)}")
+    return lc_messages
+
+model_pool = ModelPool(
+    [
+        ModelBackend(name, model, failure_threshold=MODEL_BREAKER_FAILURES,
+                     cooldown_seconds=MODEL_BREAKER_COOLDOWN_SECONDS)
+        for name, model in (
+            ("gpt-4o", gpt4o_with_tools),
+            ("gpt-4o-mini", gpt4o_mini_with_tools),
+            ("deepseek", deepseek_with_tools),
+        )
+    ],
+    PERSONA_MODEL_ORDER,
+    hedge=MODEL_HEDGING_ENABLED,
+    default_hedge_ms=MODEL_HEDGE_DEFAULT_MS,
+)
+
+async def invoke_model(agent_type, lc_messages):
+    """Pool ainvoke that records token usage, cached prompt tokens and latency per persona."""
+    start = time.perf_counter()
+    backend, response = await model_pool.ainvoke(agent_type, lc_messages)
+    elapsed = time.perf_counter() - start
+    record_usage(agent_type, response, elapsed * 1000)
+    record_model_call(backend.model_name, "reply", elapsed, response)
+    return response
+
+def _reply_trace_inputs(inputs):
+    # The user context (goals, moods, indexes) is already in the prompt the
+    # model run records; keep the reply run's own inputs small
+    preflight = inputs.get("preflight")
+    return {
+        "agent_type": inputs.get("agent_type"),
+        "history": inputs.get("history"),
+        "user_id": inputs.get("user_id"),
+        "has_user_data": bool(inputs.get("user_data")),
+        "preflight": preflight.model_dump() if preflight is not None else None,
     }
-    model = model_router.get(agent_type, gpt4o_with_tools)
+
+@traced(process_inputs=_reply_trace_inputs, tags=["persona", "tabi_chat"], metadata={"component": "persona_router"})
+async def get_reply(agent_type, history, user_data=None, user_id=None, preflight=None):
+    print(f"Getting reply for agent_type: {agent_type}, user_id: {user_id}")
+    annotate_run(f"Persona: {agent_type}", persona_type=agent_type, user_id=user_id, has_user_data=bool(user_data))
+
+    prompt = await goal_clarification(agent_type, history, preflight)
+    if prompt:
+        return prompt
+
+    with span("response_cache"):
+        cached, cache_probe = await cached_reply(agent_type, history, user_data)
+    if cached:
+        return cached
+
+    model_name = model_pool.primary(agent_type).model_name
+    with span("build_prompt"):
+        lc_messages = await build_messages(agent_type, history, user_data, model_name)
     try:
-        response = await model.ainvoke(lc_messages)
+        response = await invoke_model(agent_type, lc_messages)
         if hasattr(response, "tool_calls") and response.tool_calls:
-            tool_results = []
-            for tool_call in response.tool_calls:
-                result = await execute_tool_call(tool_call, user_id)
-                tool_results.append(result)
+            tool_results = await execute_tool_calls(response.tool_calls, user_id)
             lc_messages.append(response)
             for i, tool_call in enumerate(response.tool_calls):
                 tool_result = tool_results[i]
@@ -152,7 +402,7 @@ async def get_reply(agent_type, history, user_data=None, user_id=None):
                     tool_call_id=tool_call["id"]
                 )
                 lc_messages.append(tool_message)
-            final_response = await model.ainvoke(lc_messages)
+            final_response = await invoke_model(agent_type, lc_messages)
             if hasattr(final_response, 'content') and final_response.content:
                 return final_response.content
             else:
@@ -161,6 +411,8 @@ async def get_reply(agent_type, history, user_data=None, user_id=None):
                        return f"I had trouble adding that goal: Could you clarify your goal or try again?"
                 return "I've noted your goal request. What would you like to work on next?"
         if hasattr(response, 'content') and response.content:
+            if cache_probe:
+                response_cache.store(cache_probe, response.content)
             return response.content
         else:
             return "I'm here to help with your wellness journey! What would you like to work on today?"
@@ -171,10 +423,102 @@ async def get_reply(agent_type, history, user_data=None, user_id=None):
         return "I'm having trouble processing that right now. Could you try rephrasing your request?"
 
 
-async def generate_chat_summary(messages):
+@traced(process_inputs=_reply_trace_inputs, tags=["persona", "tabi_chat", "stream"], metadata={"component": "persona_router"})
+async def stream_reply(agent_type, history, user_data=None, user_id=None, preflight=None):
     """
-    Generate a short title/summary from recent chat messages.
+    Streaming counterpart of get_reply.
+
+    Yields (event, data) tuples: "token" for each content delta, "tool_start"
+    and "tool_end" around every tool call, then a final "done" carrying the
+    full reply text (or "error" if the model call failed).
     """
+    print(f"Streaming reply for agent_type: {agent_type}, user_id: {user_id}")
+    prompt = await goal_clarification(agent_type, history, preflight)
+    if prompt:
+        yield "token", {"content": prompt}
+        yield "done", {"reply": prompt}
+        return
+
+    with span("response_cache"):
+        cached, cache_probe = await cached_reply(agent_type, history, user_data)
+    if cached:
+        yield "token", {"content": cached}
+        yield "done", {"reply": cached, "cached": True}
+        return
+
+    model_name = model_pool.primary(agent_type).model_name
+    with span("build_prompt"):
+        lc_messages = await build_messages(agent_type, history, user_data, model_name)
+    reply_parts = []
+    used_tools = False
+    try:
+        gathered = None
+        start = time.perf_counter()
+        async for backend, chunk in model_pool.astream(agent_type, lc_messages):
+            gathered = chunk if gathered is None else gathered + chunk
+            if chunk.content:
+                reply_parts.append(chunk.content)
+                yield "token", {"content": chunk.content}
+        if gathered is not None:
+            elapsed = time.perf_counter() - start
+            record_usage(agent_type, gathered, elapsed * 1000)
+            record_model_call(backend.model_name, "reply", elapsed, gathered)
+
+        if gathered is not None and gathered.tool_calls:
+            used_tools = True
+            lc_messages.append(gathered)
+            tool_calls = gathered.tool_calls
+            for tool_call in tool_calls:
+                yield "tool_start", {"id": tool_call["id"], "name": tool_call["name"]}
+            tool_results = [None] * len(tool_calls)
+            async for i, result in iter_tool_results(tool_calls, user_id):
+                tool_results[i] = result
+                failed = isinstance(result, dict) and "error" in result
+                yield "tool_end", {"id": tool_calls[i]["id"], "name": tool_calls[i]["name"], "ok": not failed}
+            for tool_call, result in zip(tool_calls, tool_results):
+                lc_messages.append(ToolMessage(
+                    content=str(result),
+                    tool_call_id=tool_call["id"]
+                ))
+            final = None
+            start = time.perf_counter()
+            async for backend, chunk in model_pool.astream(agent_type, lc_messages):
+                final = chunk if final is None else final + chunk
+                if chunk.content:
+                    reply_parts.append(chunk.content)
+                    yield "token", {"content": chunk.content}
+            if final is not None:
+                elapsed = time.perf_counter() - start
+                record_usage(agent_type, final, elapsed * 1000)
+                record_model_call(backend.model_name, "reply", elapsed, final)
+
+        reply = "".join(reply_parts)
+        if not reply:
+            reply = "I'm here to help with your wellness journey! What would you like to work on today?"
+            yield "token", {"content": reply}
+        elif cache_probe and not used_tools:
+            response_cache.store(cache_probe, reply)
+        yield "done", {"reply": reply}
+    except Exception as model_error:
+        print(f"Model streaming error: {model_error}")
+        import traceback
+        traceback.print_exc()
+        yield "error", {"message": "I'm having trouble processing that right now. Could you try rephrasing your request?"}
+
+
+def _summary_turns(messages):
+    # Only the opening exchange matters for a title: up to 3 user+bot pairs.
+    return [
+        {"role": m.get("role"), "content": m.get("content")}
+        for m in messages[:6]
+        if m.get("role") in ("user", "assistant")
+    ]
+
+def summary_key(messages):
+    payload = json.dumps(_summary_turns(messages), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+async def _summarize(messages):
     lc_messages = [
         SystemMessage(
             content=(
@@ -183,20 +527,53 @@ async def generate_chat_summary(messages):
             )
         )
     ]
+    for msg in _summary_turns(messages):
+        if msg["role"] == "user":
+            lc_messages.append(HumanMessage(content=msg["content"]))
+        else:
+            lc_messages.append(AIMessage(content=msg["content"]))
 
-    # Add only first few user+bot messages
-    for msg in messages[:6]:  # up to 3 pairs
-        role = msg.get("role")
-        content = msg.get("content")
-        if role == "user":
-            lc_messages.append(HumanMessage(content=content))
-        elif role == "assistant":
-            lc_messages.append(AIMessage(content=content))
+    with model_span(gpt4o_mini.model_name, "title") as call:
+        response = await summary_model.ainvoke(lc_messages)
+        call.record(response)
+    summary = response.content.strip().strip('"')  # Remove extra quotes
+    return summary[:50] or "Chat Summary"
 
+async def generate_chat_summary(messages, key=None):
+    """
+    Generate a short title/summary from recent chat messages.
+    """
+    key = key or summary_key(messages)
+    cached = summary_cache.get(key)
+    if cached is not None:
+        return cached
     try:
-        response = await gpt4o_with_tools.ainvoke(lc_messages)
-        summary = response.content.strip().strip('"')  # Remove extra quotes
-        return summary[:50] or "Chat Summary"
+        summary = await _summarize(messages)
     except Exception as e:
         print("Summary generation failed:", e)
-        return "Chat Summary"
\ No newline at end of file
+        return "Chat Summary"
+    summary_cache.set(key, summary)
+    return summary
+
+async def generate_chat_summaries(conversations):
+    """
+    Titles for many conversations at once, in input order. Identical
+    conversations are summarized once; at most SUMMARY_BATCH_CONCURRENCY
+    model calls are in flight.
+    """
+    keys = [summary_key(messages) for messages in conversations]
+    unique = {}
+    for key, messages in zip(keys, conversations):
+        unique.setdefault(key, messages)
+
+    semaphore = asyncio.Semaphore(SUMMARY_BATCH_CONCURRENCY)
+
+    async def one(key, messages):
+        if not messages:
+            return "New Chat"
+        async with semaphore:
+            return await generate_chat_summary(messages, key)
+
+    results = await asyncio.gather(*(one(key, messages) for key, messages in unique.items()))
+    by_key = dict(zip(unique, results))
+    return [by_key[key] for key in keys]
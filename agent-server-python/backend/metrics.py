@@ -0,0 +1,233 @@
+"""
+Stage timings, model and tool latency, and token usage as Prometheus metrics.
+
+Spans record into fixed-bucket histograms: one bisect and a few integer adds
+per observation, so instrumenting a stage costs about a microsecond. With
+SERVER_TIMING_ENABLED the spans of a request are also returned in a
+Server-Timing header. For streamed responses the headers go out first, so
+that header only carries the stages finished before the first byte.
+"""
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+
+from backend.config import METRICS_ENABLED, SERVER_TIMING_ENABLED
+from backend.token_budget import cached_prompt_tokens
+
+# Seconds; model calls dominate, so the buckets run up to a minute
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+REGISTRY = []
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, labels, value):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        for labels, series in sorted(items):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), series):
+                cumulative += count
+                le = bound if bound == "+Inf" else repr(float(bound))
+                lines.append(f"{self.name}_bucket{_label_text((*self.labelnames, 'le'), (*labels, le))} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labelnames, labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{_label_text(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help, labelnames):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(f"{self.name}{_label_text(self.labelnames, labels)} {value}" for labels, value in items)
+        return lines
+
+
+STAGE_SECONDS = Histogram("tabi_stage_seconds", "Time spent in a request pipeline stage.", ("stage",))
+LLM_SECONDS = Histogram("tabi_llm_call_seconds", "Model call latency.", ("model", "purpose"))
+LLM_TOKENS = Counter("tabi_llm_tokens_total", "Tokens used per model.", ("model", "kind"))
+TOOL_SECONDS = Histogram("tabi_tool_seconds", "Tool call latency.", ("tool", "outcome"))
+HTTP_SECONDS = Histogram("tabi_http_request_seconds", "Time to the end of the response.", ("method", "path", "status"))
+
+# Spans finished so far in the current request, for Server-Timing
+_request_spans = contextvars.ContextVar("request_spans", default=None)
+
+def observe_stage(stage, seconds):
+    if not METRICS_ENABLED:
+        return
+    STAGE_SECONDS.observe((stage,), seconds)
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((stage, seconds))
+
+def record_tokens(model, message):
+    """Add a response's usage_metadata to the per-model token counters."""
+    if not METRICS_ENABLED:
+        return
+    usage = getattr(message, "usage_metadata", None) or {}
+    for kind in ("input_tokens", "output_tokens"):
+        if usage.get(kind):
+            LLM_TOKENS.inc((model, kind[:-7]), usage[kind])
+    cached = cached_prompt_tokens(message)
+    if cached:
+        LLM_TOKENS.inc((model, "cached"), cached)
+
+def record_model_call(model, purpose, seconds, message=None):
+    if not METRICS_ENABLED:
+        return
+    LLM_SECONDS.observe((model, purpose), seconds)
+    observe_stage(f"llm_{purpose}", seconds)
+    if message is not None:
+        record_tokens(model, message)
+
+def record_tool_call(tool, outcome, seconds):
+    if not METRICS_ENABLED:
+        return
+    TOOL_SECONDS.observe((tool, outcome), seconds)
+    observe_stage(f"tool_{tool}", seconds)
+
+
+class _Span:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe_stage(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class _ModelSpan:
+    __slots__ = ("model", "purpose", "start", "message")
+
+    def __init__(self, model, purpose):
+        self.model = model
+        self.purpose = purpose
+        self.message = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def record(self, message):
+        """Attach the response so its token usage is counted on exit."""
+        self.message = message
+
+    def __exit__(self, *exc):
+        record_model_call(self.model, self.purpose, time.perf_counter() - self.start, self.message)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def record(self, message):
+        pass
+
+_NOOP = _NoopSpan()
+
+def span(stage):
+    """`with span("stt"):` times the block into tabi_stage_seconds."""
+    return _Span(stage) if METRICS_ENABLED else _NOOP
+
+def model_span(model, purpose):
+    """Like span(), for one model call; call .record(response) to count its tokens."""
+    return _ModelSpan(model, purpose) if METRICS_ENABLED else _NOOP
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+def server_timing(spans, total):
+    parts = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in spans]
+    parts.append(f"app;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing each HTTP request by route, and adding the
+    Server-Timing header when enabled.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        spans = []
+        token = _request_spans.set(spans)
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                if SERVER_TIMING_ENABLED:
+                    header = server_timing(spans, time.perf_counter() - start)
+                    message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_spans.reset(token)
+            # FastAPI puts the matched route in the scope; unmatched paths share one label
+            path = getattr(scope.get("route"), "path", "other")
+            HTTP_SECONDS.observe((scope["method"], path, str(status[0])), time.perf_counter() - start)
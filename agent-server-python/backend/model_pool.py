@@ -0,0 +1,217 @@
+"""
+Pool of chat model backends with latency tracking, hedged requests, circuit
+breakers and a per-persona fallback order.
+
+Each backend keeps a rolling window of call latencies and outcomes. A call
+goes to the first healthy backend in the persona's order; if it hasn't
+answered within that backend's p95 latency, the next healthy backend is
+fired as well and whichever answers first wins. A backend whose recent
+calls keep failing is skipped (breaker open) until a cool-down passes, then
+gets a single trial call (half-open).
+"""
+import asyncio
+import time
+from collections import deque
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class ModelBackend:
+    def __init__(self, name, model, window=100, failure_threshold=5, cooldown_seconds=30.0):
+        self.name = name
+        self.model = model
+        self.latencies_ms = deque(maxlen=window)  # ainvoke calls; drives the hedge delay
+        self.first_chunk_ms = deque(maxlen=window)  # time to first streamed chunk
+        self.outcomes = deque(maxlen=window)  # True = success
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+
+    @property
+    def model_name(self):
+        return getattr(getattr(self.model, "bound", self.model), "model_name", self.name)
+
+    def percentile(self, q, samples=None):
+        samples = self.latencies_ms if samples is None else samples
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def error_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return 1 - sum(self.outcomes) / len(self.outcomes)
+
+    def available(self):
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown_seconds:
+            self.state = HALF_OPEN
+        return self.state == HALF_OPEN and not self._trial_in_flight
+
+    def begin(self):
+        if self.state == HALF_OPEN:
+            self._trial_in_flight = True
+
+    def record_success(self, elapsed_ms=None):
+        if elapsed_ms is not None:
+            self.latencies_ms.append(elapsed_ms)
+        self.outcomes.append(True)
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.outcomes.append(False)
+        self.consecutive_failures += 1
+        self._trial_in_flight = False
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != OPEN:
+                print(f"Circuit opened for model backend {self.name}")
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def record_cancelled(self):
+        # Lost a hedge race or the stream was abandoned; says nothing about health
+        self._trial_in_flight = False
+
+    def record_first_chunk(self, elapsed_ms):
+        self.first_chunk_ms.append(elapsed_ms)
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "calls": len(self.outcomes),
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "stream_first_chunk_p95_ms": self.percentile(0.95, self.first_chunk_ms),
+            "error_rate": self.error_rate(),
+        }
+
+
+class ModelPool:
+    def __init__(self, backends, persona_order, hedge=True, default_hedge_ms=4000.0,
+                 min_hedge_ms=250.0, min_samples=10):
+        self.backends = {b.name: b for b in backends}
+        self.persona_order = persona_order
+        self.hedge = hedge
+        self.default_hedge_ms = default_hedge_ms
+        self.min_hedge_ms = min_hedge_ms
+        self.min_samples = min_samples
+        self.hedges_fired = 0
+        self.hedges_won = 0
+        self.failovers = 0
+
+    def order(self, persona):
+        names = self.persona_order.get(persona) or self.persona_order["default"]
+        return [self.backends[n] for n in names if n in self.backends]
+
+    def candidates(self, persona):
+        ordered = self.order(persona)
+        healthy = [b for b in ordered if b.available()]
+        # With every breaker open, still try in order rather than fail outright
+        return healthy or ordered
+
+    def primary(self, persona):
+        return self.candidates(persona)[0]
+
+    def hedge_delay(self, backend):
+        if len(backend.latencies_ms) < self.min_samples:
+            return self.default_hedge_ms / 1000
+        return max(self.min_hedge_ms, backend.percentile(0.95)) / 1000
+
+    async def _call(self, backend, messages):
+        backend.begin()
+        start = time.perf_counter()
+        try:
+            response = await backend.model.ainvoke(messages)
+        except asyncio.CancelledError:
+            backend.record_cancelled()
+            raise
+        except Exception:
+            backend.record_failure()
+            raise
+        backend.record_success((time.perf_counter() - start) * 1000)
+        return backend, response
+
+    async def ainvoke(self, persona, messages):
+        """Returns (backend, response) from the first backend to answer successfully."""
+        queue = list(self.candidates(persona))
+        last_error = None
+        while queue:
+            primary = queue.pop(0)
+            running = {asyncio.ensure_future(self._call(primary, messages))}
+            hedge_pending = self.hedge and bool(queue)
+            try:
+                while running:
+                    timeout = self.hedge_delay(primary) if hedge_pending else None
+                    done, running = await asyncio.wait(
+                        running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    if not done:
+                        # Primary is slower than its p95: race the next backend
+                        hedge_pending = False
+                        self.hedges_fired += 1
+                        secondary = queue.pop(0)
+                        print(f"Hedging {primary.name} with {secondary.name} for {persona}")
+                        running.add(asyncio.ensure_future(self._call(secondary, messages)))
+                        continue
+                    for task in done:
+                        if task.exception() is None:
+                            backend, response = task.result()
+                            if backend is not primary:
+                                self.hedges_won += 1
+                            return backend, response
+                        last_error = task.exception()
+                        print(f"Model backend error: {last_error}")
+            finally:
+                for task in running:
+                    task.cancel()
+            self.failovers += 1
+        raise last_error or RuntimeError(f"No model backend available for {persona}")
+
+    async def astream(self, persona, messages):
+        """
+        Yield (backend, chunk). Fails over to the next backend only if the
+        current one errors before producing its first chunk. Streams record
+        their time to first chunk, which is kept apart from the ainvoke
+        latencies the hedge delay is based on.
+        """
+        last_error = None
+        for backend in self.candidates(persona):
+            backend.begin()
+            start = time.perf_counter()
+            started = False
+            try:
+                async for chunk in backend.model.astream(messages):
+                    if not started:
+                        started = True
+                        backend.record_first_chunk((time.perf_counter() - start) * 1000)
+                    yield backend, chunk
+            except (asyncio.CancelledError, GeneratorExit):
+                # Also reached when the consumer closes the stream early
+                backend.record_cancelled()
+                raise
+            except Exception as e:
+                backend.record_failure()
+                if started:
+                    raise
+                last_error = e
+                self.failovers += 1
+                print(f"Model backend {backend.name} failed before streaming: {e}")
+                continue
+            backend.record_success()
+            return
+        raise last_error or RuntimeError(f"No model backend available for {persona}")
+
+    def stats(self):
+        return {
+            "hedges_fired": self.hedges_fired,
+            "hedges_won": self.hedges_won,
+            "failovers": self.failovers,
+            "backends": {name: b.stats() for name, b in self.backends.items()},
+        }
@@ -11,4 +11,11 @@ class ChatRequest(BaseModel):
     uid: str = None
 
 class SummaryRequest(BaseModel):
-    messages: List[dict]
\ No newline at end of file
+    messages: List[dict]
+
+class SummaryBatchItem(BaseModel):
+    id: str = None
+    messages: List[dict]
+
+class SummaryBatchRequest(BaseModel):
+    conversations: List[SummaryBatchItem]
\ No newline at end of file
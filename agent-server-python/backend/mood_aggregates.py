@@ -0,0 +1,153 @@
+"""
+Compact rolling statistics over mood entries, for the system prompt.
+
+Entries are accumulated into per-week buckets of counters, so adding or
+removing an entry is O(1) and the rendered summary has a fixed size however
+many entries the window holds: mood distribution, top emotions, a weekly
+mood trend and the last few notes.
+"""
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from backend.mood_extraction import _end_date_utc
+
+# Rough valence per mood word, for the weekly trend
+MOOD_SCORES = {
+    "great": 1.0, "good": 1.0, "happy": 1.0,
+    "ok": 0.0, "okay": 0.0, "fine": 0.0, "neutral": 0.0,
+    "bad": -1.0, "sad": -1.0, "awful": -1.0,
+}
+
+_EPOCH_MONDAY = datetime(1970, 1, 5).date()
+
+def _week(when):
+    return (when.date() - _EPOCH_MONDAY).days // 7  # weeks start on Monday
+
+def _week_start(week):
+    return _EPOCH_MONDAY + timedelta(weeks=week)
+
+
+class _Bucket:
+    __slots__ = ("moods", "emotions", "score_sum", "scored", "entries")
+
+    def __init__(self):
+        self.moods = Counter()
+        self.emotions = Counter()
+        self.score_sum = 0.0
+        self.scored = 0
+        self.entries = 0
+
+
+class MoodAggregate:
+    def __init__(self, days=60, notes=3, top_emotions=5):
+        self.days = days
+        self.max_notes = notes
+        self.top_emotions = top_emotions
+        self._buckets = {}  # week number -> _Bucket
+        # Newest first: (when, mood, emotions, note). Twice the notes shown are
+        # kept so deleting a listed note lets the next-newest move up.
+        self._notes = []
+        self._notes_kept = 2 * notes
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_entries(cls, entries, **kwargs):
+        aggregate = cls(**kwargs)
+        for entry in entries:
+            aggregate.add(entry)
+        return aggregate
+
+    def _apply(self, entry, sign):
+        try:
+            when = _end_date_utc(entry.get("endDate"))
+        except Exception:
+            return None
+        mood = str(entry.get("mood") or "").strip().lower()
+        emotions = [str(e).strip().lower() for e in entry.get("emotions") or [] if e]
+        week = _week(when)
+        bucket = self._buckets.get(week)
+        if bucket is None:
+            if sign < 0:
+                return None
+            bucket = self._buckets[week] = _Bucket()
+        bucket.entries += sign
+        if mood:
+            bucket.moods[mood] += sign
+            if mood in MOOD_SCORES:
+                bucket.score_sum += sign * MOOD_SCORES[mood]
+                bucket.scored += sign
+        for emotion in emotions:
+            bucket.emotions[emotion] += sign
+        if bucket.entries <= 0:
+            del self._buckets[week]
+        return when, mood, emotions
+
+    def add(self, entry):
+        with self._lock:
+            applied = self._apply(entry, 1)
+            note = (entry.get("note") or "").strip()
+            if applied is None or not note:
+                return
+            when, mood, emotions = applied
+            if len(self._notes) >= self._notes_kept and when <= self._notes[-1][0]:
+                return
+            self._notes.append((when, mood, emotions, note))
+            self._notes.sort(key=lambda item: item[0], reverse=True)
+            del self._notes[self._notes_kept:]
+
+    def remove(self, entry):
+        with self._lock:
+            applied = self._apply(entry, -1)
+            if applied is None:
+                return
+            when = applied[0]
+            note = (entry.get("note") or "").strip()
+            self._notes = [n for n in self._notes if not (n[0] == when and n[3] == note)]
+
+    def latest_notes(self):
+        """Note texts the summary currently lists."""
+        with self._lock:
+            return {note for _, _, _, note in self._notes[:self.max_notes]}
+
+    def summary(self, now=None):
+        """Fixed-size prompt text for entries in the window, or "" if none."""
+        now = now or datetime.now(timezone.utc)
+        first_week = _week(now - timedelta(days=self.days))
+        with self._lock:
+            for week in [w for w in self._buckets if w < first_week]:
+                del self._buckets[week]  # aged out of the window
+            weeks = sorted(self._buckets)
+            moods, emotions = Counter(), Counter()
+            total = 0
+            trend = []
+            for week in weeks:
+                bucket = self._buckets[week]
+                moods.update(bucket.moods)
+                emotions.update(bucket.emotions)
+                total += bucket.entries
+                if bucket.scored:
+                    trend.append(f"{_week_start(week).isoformat()} {bucket.score_sum / bucket.scored:+.1f} ({bucket.entries})")
+            cutoff = now - timedelta(days=self.days)
+            notes = [n for n in self._notes if n[0] >= cutoff][:self.max_notes]
+        if not total:
+            return ""
+
+        distribution = ", ".join(
+            f"{mood} {count / total:.0%}" for mood, count in moods.most_common(5) if count > 0
+        )
+        lines = [f"Mood Summary (last {self.days} days, {total} entries):"]
+        if distribution:
+            lines.append(f"Mood distribution: {distribution}")
+        top = [f"{emotion} ({count})" for emotion, count in emotions.most_common(self.top_emotions) if count > 0]
+        if top:
+            lines.append(f"Top emotions: {', '.join(top)}")
+        if trend:
+            lines.append(f"Weekly mood trend (-1 bad to +1 good): {'; '.join(trend)}")
+        if notes:
+            lines.append("Latest notes:")
+            lines.extend(
+                f"- {when.date().isoformat()}: {mood or '[no mood]'} | {', '.join(emotions)} | {note[:80]}"
+                for when, mood, emotions, note in notes
+            )
+        return "\n".join(lines) + "\n"
@@ -1,9 +1,11 @@
-import re
 from google.cloud import firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
 from datetime import datetime, timedelta, timezone
-from backend.config import gpt4o
+from backend.config import gpt4o, MOOD_QUERY_LIMIT, MOOD_LEGACY_STRING_DATES
+from backend.firestore_client import get_db
+from backend.keyword_matcher import KeywordMatcher
 
-db = firestore.Client()
+db = get_db()
 
 COMMON_EMOTIONS = [
     "grateful", "hope", "content", "connected", "drained",
@@ -11,47 +13,63 @@ COMMON_EMOTIONS = [
     "anxious", "excited", "calm", "lonely", "overwhelmed"
 ]
 
-def get_recent_mood_entries(user_id: str, days: int = 60):
+# In priority order: the first listed mood that appears wins
+MOODS = ["good", "bad", "neutral", "happy", "sad", "ok", "great", "awful", "fine"]
+
+EMOTION_MATCHER = KeywordMatcher({e: [e] for e in COMMON_EMOTIONS})
+MOOD_MATCHER = KeywordMatcher({m: [m] for m in MOODS})
+
+def _end_date_utc(value):
+    """Normalise a stored endDate (Firestore timestamp or ISO string) to aware UTC."""
+    if isinstance(value, datetime):
+        end_date = value
+    else:
+        end_date = datetime.fromisoformat(str(value))
+    if end_date.tzinfo:
+        return end_date.astimezone(timezone.utc)
+    return end_date.replace(tzinfo=timezone.utc)
+
+def get_recent_mood_entries(user_id: str, days: int = 60, limit: int = MOOD_QUERY_LIMIT):
+    """
+    Newest-first mood entries whose endDate falls within the last `days`.
+
+    Uses an indexed range query on endDate rather than scanning the whole
+    collection. Legacy docs that store endDate as an ISO string are not
+    matched by a timestamp bound (Firestore compares values of the same type
+    only), so they are fetched by a second, string-bounded query.
+    """
     now = datetime.now(timezone.utc)
     min_date = now - timedelta(days=days)
 
     entries_ref = db.collection("mood_entries").document("entries").collection(user_id)
-    docs = entries_ref.stream()
-    recent_entries = []
+    queries = [entries_ref.where(filter=FieldFilter("endDate", ">=", min_date))]
+    if MOOD_LEGACY_STRING_DATES:
+        # Widen the lexical bound by a day to cover UTC offsets; the exact
+        # cutoff is re-checked after parsing below.
+        legacy_bound = (min_date - timedelta(days=1)).isoformat()
+        queries.append(entries_ref.where(filter=FieldFilter("endDate", ">=", legacy_bound)))
 
-    for doc in docs:
-        data = doc.to_dict()
-        end_date_val = data.get("endDate")
-        if end_date_val:
+    recent_entries = []
+    for query in queries:
+        docs = query.order_by("endDate", direction=firestore.Query.DESCENDING).limit(limit).stream()
+        for doc in docs:
+            data = doc.to_dict()
             try:
-                if isinstance(end_date_val, datetime):
-                    end_date = end_date_val
-                else:
-                    end_date = datetime.fromisoformat(str(end_date_val))
-                if end_date.tzinfo:
-                    end_date_utc = end_date.astimezone(timezone.utc)
-                else:
-                    end_date_utc = end_date.replace(tzinfo=timezone.utc)
-                if end_date_utc >= min_date:
-                    recent_entries.append(data)
-            except Exception as e:
+                end_date_utc = _end_date_utc(data.get("endDate"))
+            except Exception:
                 continue
-    return recent_entries
+            if end_date_utc >= min_date:
+                recent_entries.append((end_date_utc, data))
+
+    recent_entries.sort(key=lambda item: item[0], reverse=True)
+    return [data for _, data in recent_entries[:limit]]
 
 
 def _find_emotions(text):
-    emotions_found = []
-    for e in COMMON_EMOTIONS:
-        if re.search(r'\b' + re.escape(e) + r'\b', text, re.IGNORECASE):
-            emotions_found.append(e)
-    return list(set(emotions_found))
+    return EMOTION_MATCHER.labels(text)
 
 def _find_mood(text):
-    moods = ["good", "bad", "neutral", "happy", "sad", "ok", "great", "awful", "fine"]
-    for mood in moods:
-        if re.search(r'\b' + re.escape(mood) + r'\b', text, re.IGNORECASE):
-            return mood
-    return None
+    return MOOD_MATCHER.first(text)
 
 async def extract_mood_details(user_message: str, conversation_history: list = None) -> dict:
     details = {
@@ -0,0 +1,68 @@
+"""
+Single structured-output "preflight" call on gpt-4o-mini.
+
+Answers in one JSON-schema response what the regular pipeline asks several
+models for: the persona route, whether the user is chatting, setting a goal
+or logging a mood, and the goal or mood fields. Switched on with
+PREFLIGHT_ENABLED; any failure falls back to the regular pipeline.
+"""
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
+from langchain_core.messages import SystemMessage, HumanMessage
+from backend.config import gpt4o_mini
+from backend.metrics import model_span
+
+Category = Literal[
+    "physical", "mental", "spiritual", "social",
+    "financial", "intellectual", "vocational", "environmental",
+]
+
+class GoalFields(BaseModel):
+    goal_name: Optional[str] = Field(None, description="Concise goal title, at most 50 characters")
+    category_slug: Optional[Category] = Field(None, description="Wellness dimension of the goal, if clear")
+    timeframe: Optional[Literal["Week", "Month", "Quarter", "Year"]] = None
+    duration_weeks: Optional[int] = Field(None, description="How many weeks the goal runs, if stated")
+
+class MoodFields(BaseModel):
+    mood: Optional[str] = Field(None, description="Overall mood in one word, like good, bad or neutral")
+    emotions: List[str] = Field(default_factory=list, description="Specific emotions named or clearly implied")
+
+class Preflight(BaseModel):
+    route: Literal["main", "physical", "mental", "spiritual", "social",
+                   "financial", "intellectual", "vocational", "environmental"]
+    intent: Literal["chat", "goal", "mood"]
+    goal: Optional[GoalFields] = None
+    mood: Optional[MoodFields] = None
+
+SYSTEM_PROMPT = (
+    "You triage messages for a wellness chatbot.\n"
+    "route: the wellness domain the message best fits "
+    "(physical, mental, spiritual, social, financial, intellectual, vocational, environmental), "
+    "or main if it fits none.\n"
+    "intent: goal if the user asks to set, create or add a personal goal; "
+    "mood if they are logging or describing how they feel; otherwise chat.\n"
+    "Fill goal only for goal intent and mood only for mood intent; leave unknown fields null."
+)
+
+_preflight_model = gpt4o_mini.with_structured_output(Preflight, method="json_schema")
+
+PREFLIGHT_STATS = {"calls": 0, "errors": 0, "chat": 0, "goal": 0, "mood": 0}
+
+async def run_preflight(user_message: str):
+    """Return a Preflight for the message, or None if the call failed."""
+    PREFLIGHT_STATS["calls"] += 1
+    try:
+        with model_span(gpt4o_mini.model_name, "preflight"):
+            result = await _preflight_model.ainvoke([
+                SystemMessage(content=SYSTEM_PROMPT),
+                HumanMessage(content=user_message),
+            ])
+    except Exception as e:
+        PREFLIGHT_STATS["errors"] += 1
+        print(f"Preflight error: {e}")
+        return None
+    PREFLIGHT_STATS[result.intent] += 1
+    return result
+
+def preflight_stats():
+    return dict(PREFLIGHT_STATS)
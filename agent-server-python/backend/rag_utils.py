@@ -1,6 +1,37 @@
 import os
+import re
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from backend.mood_extraction import get_recent_mood_entries
+from datetime import datetime, timedelta, timezone
+from backend.config import (
+    FIRESTORE_MAX_WORKERS,
+    USER_CONTEXT_CACHE_TTL,
+    USER_CONTEXT_CACHE_SIZE,
+    USER_SNAPSHOTS_ENABLED,
+    USER_SNAPSHOT_SOURCE,
+    USER_SNAPSHOT_IDLE_SECONDS,
+    USER_SNAPSHOT_MAX_USERS,
+    USER_SNAPSHOT_INITIAL_TIMEOUT,
+    USER_SNAPSHOT_RETRY_SECONDS,
+    MOOD_SUMMARY_ENABLED,
+    MOOD_SUMMARY_NOTES,
+    MOOD_SUMMARY_TOP_EMOTIONS,
+    RETRIEVAL_ENABLED,
+    RETRIEVAL_TOP_GOALS,
+    RETRIEVAL_MIN_GOALS,
+    RETRIEVAL_TOP_NOTES,
+    RETRIEVAL_ROUTE_WEIGHT,
+    MOOD_LEGACY_STRING_DATES,
+)
+from backend.cache import TTLCache
+from backend.mood_extraction import get_recent_mood_entries, _end_date_utc
+from backend.timing import timed
+from backend.goal_queue import goal_queue
+from backend.user_snapshots import SnapshotStore, FirestoreListenerSource, LocalListenerSource, GOALS
+from backend.mood_aggregates import MoodAggregate
+from backend.goal_extraction import CATEGORY_KEYWORDS
+from backend.retrieval import GOAL, NOTE, RetrievalIndex, build_index, goal_text, query_weights
 
 
 # Load from .env file
@@ -9,9 +40,74 @@ load_dotenv()
 service_account_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
 
 
-from google.cloud import firestore
+from backend.firestore_client import get_db
 
-db = firestore.Client()
+db = get_db()
+
+# The sync Firestore client blocks; keep its calls off the event loop and cap
+# how many run at once.
+_firestore_executor = ThreadPoolExecutor(
+    max_workers=FIRESTORE_MAX_WORKERS, thread_name_prefix="firestore"
+)
+
+async def run_blocking(fn, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_firestore_executor, fn, *args)
+
+# uid -> {"profile", "goals", "recent_moods"}
+user_context_cache = TTLCache(ttl=USER_CONTEXT_CACHE_TTL, maxsize=USER_CONTEXT_CACHE_SIZE)
+
+def new_mood_aggregate():
+    return MoodAggregate(days=60, notes=MOOD_SUMMARY_NOTES, top_emotions=MOOD_SUMMARY_TOP_EMOTIONS)
+
+snapshot_store = SnapshotStore(
+    LocalListenerSource() if USER_SNAPSHOT_SOURCE == "local"
+    else FirestoreListenerSource(mood_days=60, legacy_string_dates=MOOD_LEGACY_STRING_DATES),
+    idle_seconds=USER_SNAPSHOT_IDLE_SECONDS,
+    max_users=USER_SNAPSHOT_MAX_USERS,
+    initial_timeout=USER_SNAPSHOT_INITIAL_TIMEOUT,
+    retry_seconds=USER_SNAPSHOT_RETRY_SECONDS,
+    new_mood_aggregate=new_mood_aggregate,
+    new_retrieval_index=RetrievalIndex if RETRIEVAL_ENABLED else None,
+)
+
+def mood_aggregate(user_data):
+    """The context's mood aggregate, built once per fetched context."""
+    aggregate = user_data.get("mood_aggregate")
+    if aggregate is None:
+        aggregate = new_mood_aggregate()
+        for entry in user_data.get("recent_moods", []):
+            aggregate.add(entry)
+        user_data["mood_aggregate"] = aggregate
+    return aggregate
+
+def retrieval_index(user_data):
+    """The context's retrieval index, built once per fetched context."""
+    index = user_data.get("retrieval_index")
+    if index is None:
+        index = build_index(user_data.get("goals", []), user_data.get("recent_moods", []))
+        user_data["retrieval_index"] = index
+    return index
+
+def _prepare_context(user_data):
+    """Build the retrieval index and mood aggregate; CPU-bound, so run it off the event loop."""
+    if RETRIEVAL_ENABLED:
+        retrieval_index(user_data)
+    if MOOD_SUMMARY_ENABLED:
+        mood_aggregate(user_data)
+
+def cache_goal_added(user_id: str, goal: dict):
+    """Write-through: append a freshly created goal to the cached context."""
+    def add(data):
+        index = data.get("retrieval_index")
+        if index is not None:
+            index.add(GOAL, goal["id"], goal, goal_text(goal))
+        return {**data, "goals": [*data.get("goals", []), goal]}
+    user_context_cache.update(user_id, add)
+    # The listener delivers it once committed; show it on the next turn already
+    snapshot = snapshot_store.peek(user_id)
+    if snapshot is not None:
+        snapshot.apply(GOALS, goal["id"], goal)
 
 def get_user_profile(user_id: str):
     doc_ref = db.collection("users").document(user_id).collection("profile").document("general")
@@ -23,36 +119,172 @@ def get_user_goals(user_id: str):
     goals_ref = db.collection("goals")
     query_ref = goals_ref.where("user_id", "==", user_id)
     results = query_ref.stream()
-    return [doc.to_dict() for doc in results]
+    goals = [{**doc.to_dict(), "id": doc.id} for doc in results]
+    # Read-your-writes: include goals still waiting in the write-behind queue
+    stored = {g["id"] for g in goals}
+    goals.extend(g for g in goal_queue.pending_for(user_id) if g["id"] not in stored)
+    return goals
 
-def get_user_data(user_id: str):
-    profile = get_user_profile(user_id)
-    goals = get_user_goals(user_id)
-    recent_moods = get_recent_mood_entries(user_id, days=60)  # fetch last 7 days
-    return {"profile": profile, "goals": goals, "recent_moods": recent_moods}
+async def get_user_data_async(user_id: str, timings: dict = None):
+    """
+    Fetch profile, goals and recent moods concurrently on the Firestore pool.
+    A failed read degrades to an empty value instead of failing the turn.
+    """
+    timings = {} if timings is None else timings
+    if USER_SNAPSHOTS_ENABLED:
+        snapshot = await timed("snapshot", run_blocking(snapshot_store.get, user_id), timings)
+        if snapshot is not None:
+            return snapshot.user_data()
+        # Listener not warm yet: fall through to a one-off read
+    cached = user_context_cache.get(user_id)
+    if cached is not None:
+        return cached
+    profile, goals, recent_moods = await asyncio.gather(
+        timed("profile", run_blocking(get_user_profile, user_id), timings),
+        timed("goals", run_blocking(get_user_goals, user_id), timings),
+        timed("moods", run_blocking(get_recent_mood_entries, user_id, 60), timings),
+        return_exceptions=True,
+    )
+    failed = False
+    if isinstance(profile, Exception):
+        print(f"Profile fetch error: {profile}")
+        profile, failed = {}, True
+    if isinstance(goals, Exception):
+        print(f"Goals fetch error: {goals}")
+        goals, failed = [], True
+    if isinstance(recent_moods, Exception):
+        print(f"Mood fetch error: {recent_moods}")
+        recent_moods, failed = [], True
+    user_data = {"profile": profile, "goals": goals, "recent_moods": recent_moods}
+    # Built here rather than on first use in build_messages, which runs on the event loop
+    if RETRIEVAL_ENABLED or MOOD_SUMMARY_ENABLED:
+        await timed("index", run_blocking(_prepare_context, user_data), timings)
+    # Don't pin a partial context for a whole TTL
+    if not failed:
+        user_context_cache.set(user_id, user_data)
+    return user_data
 
-def format_profile_goals_and_moods(user_data):
-    profile = user_data.get("profile", {})
-    goals = user_data.get("goals", [])
-    moods = user_data.get("recent_moods", [])
+_WORD = re.compile(r"[a-z]{3,}")
 
-    profile_text = (
+def _timestamp(value):
+    try:
+        return _end_date_utc(value).timestamp() if value else 0.0
+    except Exception:
+        return 0.0
+
+def rank_goals(goals, query: str = None, limit: int = None):
+    """Goals sharing the most words with `query` first, then most recently started."""
+    query_words = set(_WORD.findall(query.lower())) if query else set()
+
+    def score(g):
+        text = f"{g.get('goalName', '')} {g.get('goalDescription', '')}".lower()
+        overlap = len(query_words & set(_WORD.findall(text)))
+        return (overlap, _timestamp(g.get("startDate")))
+
+    ranked = sorted(goals, key=score, reverse=True)
+    return ranked[:limit] if limit else ranked
+
+def latest_moods(moods, limit: int = None):
+    ranked = sorted(moods, key=lambda m: _timestamp(m.get("endDate")), reverse=True)
+    return ranked[:limit] if limit else ranked
+
+def retrieve(index, goals, query, route=None):
+    """
+    (goals, notes) for the prompt: the top BM25 matches for the message and
+    route, goals padded with the most recent up to RETRIEVAL_MIN_GOALS.
+    """
+    weights = query_weights(query, route, CATEGORY_KEYWORDS.get(route, ()), RETRIEVAL_ROUTE_WEIGHT)
+    matched = [g for _, g in index.search(weights, GOAL, RETRIEVAL_TOP_GOALS)]
+    if len(matched) < RETRIEVAL_MIN_GOALS:
+        seen = {id(g) for g in matched}
+        recent = rank_goals([g for g in goals if id(g) not in seen], limit=RETRIEVAL_MIN_GOALS - len(matched))
+        matched.extend(recent)
+    notes = [m for _, m in index.search(weights, NOTE, RETRIEVAL_TOP_NOTES)]
+    return matched, notes
+
+def _notes_text(notes, aggregate=None):
+    if aggregate is not None:
+        shown = aggregate.latest_notes()  # already in the mood summary
+        notes = [m for m in notes if (m.get("note") or "").strip() not in shown]
+    if not notes:
+        return ""
+    return "Relevant Past Notes:\n" + "\n".join(_mood_line(m) for m in notes) + "\n"
+
+def _profile_text(profile):
+    return (
         f"User Profile:\n"
         f"Name: {profile.get('name', '[unknown]')}\n"
         f"Age: {profile.get('age', '[unknown]')}\n"
         f"Gender: {profile.get('gender', '[unknown]')}\n"
     )
+
+def _goal_line(g):
+    return f"- {g.get('goalName', '[No name]')}: {g.get('goalDescription', '[No description]')}"
+
+def _mood_line(m):
+    return f"{m.get('endDate', '[no date]')}: {m.get('mood', '[no mood]')} | Emotions: {', '.join(m.get('emotions', []))} | Note: {m.get('note', '')[:40]}..."
+
+def _moods_text(moods):
+    if not moods:
+        return ""
+    return "Recent Mood Entries:\n" + "\n".join([_mood_line(m) for m in moods]) + "\n"
+
+def _render_context(profile, goals, moods_text, goal_line=_goal_line):
     goals_text = ""
     if goals:
-        goals_text = "User Goals:\n" + "\n".join(
-            [f"- {g.get('goalName', '[No name]')}: {g.get('goalDescription', '[No description]')}" for g in goals]
-        ) + "\n"
-    moods_text = ""
-    if moods:
-        moods_text = "Recent Mood Entries:\n" + "\n".join(
-            [f"{m.get('endDate', '[no date]')}: {m.get('mood', '[no mood]')} | Emotions: {', '.join(m.get('emotions', []))} | Note: {m.get('note', '')[:40]}..." for m in moods]
-        ) + "\n"
-    return profile_text + goals_text + moods_text
+        goals_text = "User Goals:\n" + "\n".join([goal_line(g) for g in goals]) + "\n"
+    return _profile_text(profile) + goals_text + moods_text
+
+def _format_snapshot(snapshot, query, max_goals, max_moods, route):
+    # The query-independent parts (goal lines, mood text) are rendered once
+    # per snapshot version; goal and note selection runs on every turn.
+    user_data = snapshot.user_data()
+    lines = snapshot.memo("goal_lines", lambda: {g.get("id"): _goal_line(g) for g in user_data["goals"]})
+    now = datetime.now(timezone.utc)
+    min_ts = (now - timedelta(days=60)).timestamp()
+
+    def render_moods():
+        if MOOD_SUMMARY_ENABLED and user_data["mood_aggregate"] is not None:
+            return user_data["mood_aggregate"].summary(now)
+        moods = [m for m in user_data["recent_moods"] if _timestamp(m.get("endDate")) >= min_ts]
+        return _moods_text(latest_moods(moods, max_moods))
+
+    moods_text = snapshot.memo(("moods", max_moods, now.date()), render_moods)
+    goals = user_data["goals"]
+    notes_text = ""
+    if query and user_data["retrieval_index"] is not None:
+        goals, notes = retrieve(user_data["retrieval_index"], goals, query, route)
+        notes = [m for m in notes if _timestamp(m.get("endDate")) >= min_ts]
+        aggregate = user_data["mood_aggregate"] if MOOD_SUMMARY_ENABLED else None
+        notes_text = _notes_text(notes, aggregate)
+    elif query or max_goals:
+        goals = rank_goals(goals, query, max_goals)
+    return _render_context(
+        user_data["profile"], goals, moods_text + notes_text,
+        goal_line=lambda g: lines.get(g.get("id")) or _goal_line(g),
+    )
+
+def format_profile_goals_and_moods(user_data, query: str = None, max_goals: int = None, max_moods: int = None,
+                                   route: str = None):
+    snapshot = user_data.get("_snapshot")
+    if snapshot is not None:
+        return _format_snapshot(snapshot, query, max_goals, max_moods, route)
+    profile = user_data.get("profile", {})
+    goals = user_data.get("goals", [])
+    notes_text = ""
+    if RETRIEVAL_ENABLED and query:
+        goals, notes = retrieve(retrieval_index(user_data), goals, query, route)
+        notes_text = _notes_text(notes, mood_aggregate(user_data) if MOOD_SUMMARY_ENABLED else None)
+    elif query or max_goals:
+        goals = rank_goals(goals, query, max_goals)
+    if MOOD_SUMMARY_ENABLED:
+        moods_text = mood_aggregate(user_data).summary()
+    else:
+        moods = user_data.get("recent_moods", [])
+        if max_moods:
+            moods = latest_moods(moods, max_moods)
+        moods_text = _moods_text(moods)
+    return _render_context(profile, goals, moods_text + notes_text)
 
 
 def format_profile_and_goals(user_data):
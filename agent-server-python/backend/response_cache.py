@@ -0,0 +1,152 @@
+"""
+Opt-in cache for non-personalized persona replies.
+
+Entries are keyed on (route, normalized last user message, hash of the
+earlier turns). Lookups try an exact match first, then, if an embedding
+function is configured, the most similar cached message on the same route
+and context above `threshold` cosine similarity.
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+import numpy as np
+from backend.cache import TTLCache
+
+_NON_WORD = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+
+def normalize_message(text: str) -> str:
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", text.lower())).strip()
+
+def context_hash(history) -> str:
+    """Hash of every turn before the last user message."""
+    digest = hashlib.sha1()
+    for h in history[:-1]:
+        digest.update(f"{h['role']}\x00{h['content']}\x01".encode())
+    return digest.hexdigest()
+
+
+class CacheProbe:
+    """Result of a lookup, reused by store() so the message is embedded once."""
+
+    def __init__(self, route, message, context, vector=None):
+        self.route = route
+        self.message = message
+        self.context = context
+        self.vector = vector
+
+    @property
+    def key(self):
+        return (self.route, self.message, self.context)
+
+
+class ResponseCache:
+    def __init__(self, ttl: float, maxsize: int, threshold: float, embed=None):
+        self.exact = TTLCache(ttl=ttl, maxsize=maxsize)
+        self.threshold = threshold
+        self.embed = embed  # async fn(text) -> list[float], or None for exact-only
+        # (route, context) -> {key: unit vector}; pruned lazily against `exact`
+        self._vectors = {}
+        # Every indexed key in LRU order, capped at the exact tier's maxsize
+        self._vector_keys = OrderedDict()
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.stores = 0
+
+    @property
+    def enabled(self):
+        return self.exact.enabled
+
+    def bypass(self):
+        self.bypassed += 1
+
+    async def lookup(self, route, history):
+        """Return (reply or None, probe)."""
+        probe = CacheProbe(route, normalize_message(history[-1]["content"]), context_hash(history))
+        reply = self.exact.get(probe.key)
+        if reply is not None:
+            self.exact_hits += 1
+            return reply, probe
+        if self.embed is not None:
+            try:
+                probe.vector = _unit(await self.embed(probe.message))
+            except Exception as e:
+                print(f"Response cache embedding error: {e}")
+            if probe.vector is not None:
+                reply = self._nearest(probe)
+                if reply is not None:
+                    self.semantic_hits += 1
+                    return reply, probe
+        self.misses += 1
+        return None, probe
+
+    def _nearest(self, probe):
+        with self._lock:
+            bucket = self._vectors.get((probe.route, probe.context))
+            if not bucket:
+                return None
+            keys = list(bucket)
+            matrix = np.stack([bucket[k] for k in keys])
+        scores = matrix @ probe.vector
+        for idx in np.argsort(scores)[::-1]:
+            if scores[idx] < self.threshold:
+                return None
+            reply = self.exact.get(keys[idx])
+            if reply is not None:
+                with self._lock:
+                    if keys[idx] in self._vector_keys:
+                        self._vector_keys.move_to_end(keys[idx])
+                return reply
+            # Expired or evicted from the exact tier
+            with self._lock:
+                self._drop_vector(keys[idx])
+        return None
+
+    def _drop_vector(self, key):
+        """Remove one key from the vector index. Caller holds the lock."""
+        self._vector_keys.pop(key, None)
+        route, _, context = key
+        bucket = self._vectors.get((route, context))
+        if bucket is not None:
+            bucket.pop(key, None)
+            if not bucket:
+                del self._vectors[(route, context)]
+
+    def store(self, probe, reply):
+        if not self.enabled or not reply:
+            return
+        self.exact.set(probe.key, reply)
+        self.stores += 1
+        if probe.vector is not None:
+            with self._lock:
+                bucket = self._vectors.setdefault((probe.route, probe.context), {})
+                bucket[probe.key] = probe.vector
+                self._vector_keys[probe.key] = None
+                self._vector_keys.move_to_end(probe.key)
+                # Keep the vector index no larger than the exact tier
+                while len(self._vector_keys) > self.exact.maxsize:
+                    self._drop_vector(next(iter(self._vector_keys)))
+
+    def stats(self):
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self.exact),
+            "vectors": len(self._vector_keys),
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "stores": self.stores,
+            "evictions": self.exact.evictions,
+            "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+        }
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else None
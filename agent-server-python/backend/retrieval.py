@@ -0,0 +1,194 @@
+"""
+Per-user BM25 retrieval over goals and mood notes.
+
+Each user's goals and notes are indexed into per-term postings held as NumPy
+arrays (document ids and term frequencies), so a query scores every item
+with a handful of vectorized operations per query term. The index is built
+the first time a user's context is formatted and then updated in place as
+goals and moods are written.
+"""
+import math
+import re
+import threading
+from collections import Counter
+
+import numpy as np
+
+GOAL, NOTE = 0, 1
+
+_TOKEN = re.compile(r"[a-z0-9]{2,}")
+_STOPWORDS = frozenset(
+    "the and for with that this have has had was were are you your yours not but can could "
+    "would should will just about into from them they their there what when how why who "
+    "more less very really some any all its it's been being also than then too out our ours "
+    "me my mine we us him her his she he is am be do does did of on in at to as or an so if".split()
+)
+
+def tokenize(text):
+    """Lowercased content words with a light plural/-ing/-ed strip."""
+    tokens = []
+    for word in _TOKEN.findall(text.lower()):
+        if word in _STOPWORDS:
+            continue
+        if len(word) > 5 and word.endswith("ing"):
+            word = word[:-3]
+        elif len(word) > 4 and word.endswith("ed"):
+            word = word[:-2]
+        elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+def goal_text(goal):
+    return f"{goal.get('goalName', '')} {goal.get('goalDescription', '')}"
+
+def note_text(entry):
+    return f"{entry.get('note', '')} {entry.get('mood', '')} {' '.join(entry.get('emotions') or [])}"
+
+
+class RetrievalIndex:
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._columns = {}   # term -> column
+        self._postings = []  # column -> ([doc ids], [term freqs]) as appended
+        self._arrays = {}    # column -> (np doc ids, np term freqs), built on first use
+        self._lengths = np.zeros(64, dtype=np.float32)
+        self._kinds = np.zeros(64, dtype=np.int8)
+        self._alive = np.zeros(64, dtype=bool)
+        self._items = []     # doc id -> (kind, key, item, tokens)
+        self._docs = {}      # (kind, key) -> doc id
+        self._live = 0
+        self._total_length = 0.0
+
+    def __len__(self):
+        return self._live
+
+    def _grow(self, size):
+        capacity = len(self._lengths)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        for name in ("_lengths", "_kinds", "_alive"):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _add(self, kind, key, item, tokens):
+        doc = len(self._items)
+        self._grow(doc + 1)
+        self._items.append((kind, key, item, tokens))
+        self._docs[(kind, key)] = doc
+        self._lengths[doc] = len(tokens)
+        self._kinds[doc] = kind
+        self._alive[doc] = True
+        self._live += 1
+        self._total_length += len(tokens)
+        for term, tf in Counter(tokens).items():
+            column = self._columns.get(term)
+            if column is None:
+                column = self._columns[term] = len(self._postings)
+                self._postings.append(([], []))
+            docs, tfs = self._postings[column]
+            docs.append(doc)
+            tfs.append(tf)
+            self._arrays.pop(column, None)
+
+    def _remove(self, kind, key):
+        doc = self._docs.pop((kind, key), None)
+        if doc is None or not self._alive[doc]:
+            return
+        self._alive[doc] = False
+        self._live -= 1
+        self._total_length -= float(self._lengths[doc])
+
+    def _compact(self):
+        # Rebuild from live items once removed ones dominate
+        live = [item for doc, item in enumerate(self._items) if self._alive[doc]]
+        self._reset()
+        for kind, key, item, tokens in live:
+            self._add(kind, key, item, tokens)
+
+    def add(self, kind, key, item, text):
+        """Index (or re-index) one item under (kind, key)."""
+        tokens = tokenize(text)
+        with self._lock:
+            self._remove(kind, key)
+            self._add(kind, key, item, tokens)
+            if len(self._items) > 64 and self._live < len(self._items) // 2:
+                self._compact()
+
+    def remove(self, kind, key):
+        with self._lock:
+            self._remove(kind, key)
+
+    def _column(self, column):
+        arrays = self._arrays.get(column)
+        if arrays is None:
+            docs, tfs = self._postings[column]
+            arrays = self._arrays[column] = (np.array(docs, dtype=np.int32), np.array(tfs, dtype=np.float32))
+        return arrays
+
+    def search(self, query_weights, kind, k):
+        """
+        Top-k (score, item) of `kind` for {term: weight}, best first; only
+        items sharing at least one term with the query.
+        """
+        with self._lock:
+            n = len(self._items)
+            if not self._live or k <= 0:
+                return []
+            scores = np.zeros(n, dtype=np.float32)
+            lengths = self._lengths[:n]
+            alive = self._alive[:n]
+            avg_length = max(self._total_length / self._live, 1.0)
+            for term, weight in query_weights.items():
+                column = self._columns.get(term)
+                if column is None:
+                    continue
+                docs, tfs = self._column(column)
+                live = alive[docs]
+                df = int(live.sum())
+                if not df:
+                    continue
+                docs, tfs = docs[live], tfs[live]
+                idf = math.log(1.0 + (self._live - df + 0.5) / (df + 0.5))
+                norm = tfs + self.k1 * (1.0 - self.b + self.b * lengths[docs] / avg_length)
+                scores[docs] += weight * idf * tfs * (self.k1 + 1.0) / norm
+            scores[self._kinds[:n] != kind] = 0.0
+            hits = np.flatnonzero(scores > 0)
+            if not len(hits):
+                return []
+            if len(hits) > k:
+                hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+            hits = hits[np.argsort(-scores[hits], kind="stable")]
+            return [(float(scores[doc]), self._items[doc][2]) for doc in hits]
+
+
+def query_weights(message, route=None, route_terms=(), route_weight=0.3):
+    """Message terms at full weight, the route's vocabulary at `route_weight`."""
+    weights = {}
+    for term in tokenize(message or ""):
+        weights[term] = 1.0
+    if route:
+        for term in tokenize(" ".join([route, *route_terms])):
+            weights.setdefault(term, route_weight)
+    return weights
+
+def mood_key(entry):
+    return entry.get("id") or f"{entry.get('endDate')}|{entry.get('note', '')[:40]}"
+
+def build_index(goals, moods):
+    index = RetrievalIndex()
+    for goal in goals:
+        index.add(GOAL, goal.get("id") or goal.get("goalName"), goal, goal_text(goal))
+    for entry in moods:
+        if entry.get("note"):
+            index.add(NOTE, mood_key(entry), entry, note_text(entry))
+    return index
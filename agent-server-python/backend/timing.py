@@ -0,0 +1,16 @@
+import time
+from backend.metrics import observe_stage
+
+
+async def timed(stage: str, awaitable, timings: dict):
+    """
+    Await `awaitable` and record its wall time in milliseconds under `stage`,
+    and in the stage histogram.
+    """
+    start = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        elapsed = time.perf_counter() - start
+        timings[stage] = round(elapsed * 1000, 1)
+        observe_stage(stage, elapsed)
@@ -0,0 +1,130 @@
+"""
+Prompt token accounting and history trimming.
+
+Counts use tiktoken when its encoding can be loaded and fall back to a
+~4 characters per token estimate otherwise (e.g. no network to fetch the
+BPE files). The failure is remembered so requests never retry the download.
+"""
+import threading
+
+# Context window per model; the prompt budget is additionally capped by
+# PROMPT_TOKEN_BUDGET in config.
+MODEL_CONTEXT_LIMITS = {
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+    "deepseek-chat": 64000,
+}
+DEFAULT_CONTEXT_LIMIT = 64000
+# Tokens kept free for the completion
+COMPLETION_RESERVE = 2048
+# Per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD = 4
+
+_encodings = {}
+_lock = threading.Lock()
+
+def _encoding(model: str):
+    with _lock:
+        if model in _encodings:
+            return _encodings[model]
+        try:
+            import tiktoken
+            try:
+                enc = tiktoken.encoding_for_model(model)
+            except KeyError:
+                enc = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            print(f"tiktoken unavailable for {model}, estimating tokens: {e}")
+            enc = None
+        _encodings[model] = enc
+        return enc
+
+def warm_encodings(models):
+    """Load the encodings up front; may download BPE files, so run off the event loop."""
+    for model in models:
+        _encoding(model)
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    enc = _encoding(model)
+    if enc is None:
+        return len(text) // 4 + 1
+    return len(enc.encode(text, disallowed_special=()))
+
+def count_message_tokens(messages, model: str = "gpt-4o") -> int:
+    """Tokens for a list of LangChain messages or {"role", "content"} dicts."""
+    total = 0
+    for m in messages:
+        content = m["content"] if isinstance(m, dict) else m.content
+        total += count_tokens(str(content), model) + MESSAGE_OVERHEAD
+    return total
+
+def prompt_budget(model: str, cap: int) -> int:
+    limit = MODEL_CONTEXT_LIMITS.get(model, DEFAULT_CONTEXT_LIMIT) - COMPLETION_RESERVE
+    return min(limit, cap)
+
+def fit_history(history, budget: int, model: str = "gpt-4o"):
+    """
+    Split history into (dropped, kept): the longest suffix of turns that fits
+    in `budget` tokens. The latest turn is always kept.
+    """
+    kept_tokens = 0
+    start = len(history)
+    for i in range(len(history) - 1, -1, -1):
+        cost = count_tokens(str(history[i]["content"]), model) + MESSAGE_OVERHEAD
+        if start < len(history) and kept_tokens + cost > budget:
+            break
+        kept_tokens += cost
+        start = i
+    return history[:start], history[start:]
+
+
+PROMPT_TOKEN_STATS = {}
+
+def record_prompt_tokens(model: str, tokens: int):
+    stats = PROMPT_TOKEN_STATS.setdefault(model, {"requests": 0, "total": 0, "max": 0})
+    stats["requests"] += 1
+    stats["total"] += tokens
+    stats["max"] = max(stats["max"], tokens)
+
+def prompt_token_stats():
+    return {
+        model: {**s, "mean": s["total"] / s["requests"] if s["requests"] else 0}
+        for model, s in PROMPT_TOKEN_STATS.items()
+    }
+
+
+def cached_prompt_tokens(message) -> int:
+    """
+    Prompt tokens served from the provider's prefix cache. OpenAI reports them
+    in usage_metadata; DeepSeek as prompt_cache_hit_tokens in the raw usage.
+    """
+    usage = getattr(message, "usage_metadata", None) or {}
+    cached = (usage.get("input_token_details") or {}).get("cache_read")
+    if cached is None:
+        token_usage = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+        cached = token_usage.get("prompt_cache_hit_tokens")
+    return cached or 0
+
+PERSONA_USAGE_STATS = {}
+
+def record_usage(persona: str, message, elapsed_ms: float):
+    """Aggregate prompt/cached tokens and model latency per persona."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    stats = PERSONA_USAGE_STATS.setdefault(persona, {
+        "calls": 0, "input_tokens": 0, "cached_tokens": 0, "output_tokens": 0, "latency_ms": 0.0,
+    })
+    stats["calls"] += 1
+    stats["input_tokens"] += usage.get("input_tokens", 0) or 0
+    stats["cached_tokens"] += cached_prompt_tokens(message)
+    stats["output_tokens"] += usage.get("output_tokens", 0) or 0
+    stats["latency_ms"] += elapsed_ms
+
+def persona_usage_stats():
+    return {
+        persona: {
+            **s,
+            "cache_ratio": s["cached_tokens"] / s["input_tokens"] if s["input_tokens"] else 0.0,
+            "mean_latency_ms": s["latency_ms"] / s["calls"] if s["calls"] else 0.0,
+        }
+        for persona, s in PERSONA_USAGE_STATS.items()
+    }
@@ -0,0 +1,91 @@
+"""
+Runs model tool calls off the event loop, concurrently, with a timeout and a
+concurrency cap per tool, and keeps per-tool latency stats.
+"""
+import asyncio
+import time
+import traceback
+from backend.config import TOOL_TIMEOUT_SECONDS, TOOL_CONCURRENCY
+from backend.rag_utils import run_blocking
+from backend.metrics import record_tool_call
+from tools.goal_tools import add_goal_tool, list_goal_categories
+
+TOOLS = {
+    "add_goal": add_goal_tool,
+    "add_goal_tool": add_goal_tool,
+    "list_goal_categories": list_goal_categories,
+}
+
+_limits = {}
+
+def _limit(tool_name):
+    # Created lazily so the semaphores bind to the running loop
+    if tool_name not in _limits:
+        _limits[tool_name] = asyncio.Semaphore(TOOL_CONCURRENCY.get(tool_name, TOOL_CONCURRENCY["default"]))
+    return _limits[tool_name]
+
+TOOL_STATS = {}
+
+def _record(tool_name, elapsed_ms, outcome):
+    stats = TOOL_STATS.setdefault(tool_name, {
+        "calls": 0, "errors": 0, "timeouts": 0, "total_ms": 0.0, "max_ms": 0.0,
+    })
+    stats["calls"] += 1
+    stats["total_ms"] += elapsed_ms
+    stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+    if outcome == "error":
+        stats["errors"] += 1
+    elif outcome == "timeout":
+        stats["timeouts"] += 1
+
+def tool_stats():
+    return {
+        name: {**s, "mean_ms": s["total_ms"] / s["calls"] if s["calls"] else 0.0}
+        for name, s in TOOL_STATS.items()
+    }
+
+async def execute_tool_call(tool_call, user_id):
+    tool_name = tool_call["name"]
+    tool_args = dict(tool_call["args"])
+    if user_id:
+        tool_args["user_id"] = user_id
+    tool = TOOLS.get(tool_name)
+    if tool is None:
+        return {"error": f"Unknown tool: {tool_name}"}
+
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        async with _limit(tool_name):
+            # Tools are sync (Firestore); run them on the Firestore pool
+            result = await asyncio.wait_for(
+                run_blocking(tool.invoke, tool_args), timeout=TOOL_TIMEOUT_SECONDS
+            )
+        if isinstance(result, dict) and "error" in result:
+            outcome = "error"
+        return result
+    except asyncio.TimeoutError:
+        outcome = "timeout"
+        print(f"Tool {tool_name} timed out after {TOOL_TIMEOUT_SECONDS}s")
+        return {"error": f"{tool_name} timed out", "success": False}
+    except Exception as e:
+        outcome = "error"
+        print(f"Tool execution error: {e}")
+        traceback.print_exc()
+        return {"error": str(e)}
+    finally:
+        elapsed = time.perf_counter() - start
+        _record(tool_name, elapsed * 1000, outcome)
+        record_tool_call(tool_name, outcome, elapsed)
+
+async def execute_tool_calls(tool_calls, user_id):
+    """Run independent tool calls concurrently; results come back in tool_calls order."""
+    return await asyncio.gather(*(execute_tool_call(tc, user_id) for tc in tool_calls))
+
+async def iter_tool_results(tool_calls, user_id):
+    """Yield (index, result) as each concurrently running tool call finishes."""
+    async def indexed(i, tool_call):
+        return i, await execute_tool_call(tool_call, user_id)
+
+    for next_done in asyncio.as_completed([indexed(i, tc) for i, tc in enumerate(tool_calls)]):
+        yield await next_done
@@ -0,0 +1,110 @@
+"""
+Opt-in, sampled LangSmith tracing for chat turns.
+
+With TRACING_ENABLED unset the decorated functions are returned untouched,
+so a turn pays nothing for tracing. When enabled, each call is traced with
+probability TRACING_SAMPLE_RATE; the model calls it makes are traced as its
+children. Unsampled calls run the plain function. Runs go through one
+Client that exports them in batches from a background thread. The Client
+applies the payload policy (TRACING_PAYLOADS) to every run before it is
+queued.
+"""
+import functools
+import random
+import re
+
+from langsmith import Client, traceable
+from langsmith.run_helpers import get_current_run_tree
+
+from backend.config import (
+    TRACING_ENABLED,
+    TRACING_SAMPLE_RATE,
+    TRACING_PAYLOADS,
+    TRACING_MAX_FIELD_CHARS,
+    TRACING_BATCH_MAX_BYTES,
+)
+
+TRACING_STATS = {"calls": 0, "sampled": 0}
+
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+# 9 to 15 digits with light separators; dates and timestamps don't qualify
+_PHONE = re.compile(r"(?<![\w:.-])\+?\d(?:[ ().-]{0,2}\d){8,14}(?![\w:-])")
+
+def cap_payload(value):
+    """Mask emails and phone numbers and truncate long strings, recursively."""
+    if isinstance(value, str):
+        value = _PHONE.sub("[phone]", _EMAIL.sub("[email]", value))
+        if len(value) > TRACING_MAX_FIELD_CHARS:
+            value = f"{value[:TRACING_MAX_FIELD_CHARS]}... [{len(value) - TRACING_MAX_FIELD_CHARS} chars truncated]"
+        return value
+    if isinstance(value, dict):
+        return {k: cap_payload(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [cap_payload(v) for v in value]
+    return value
+
+def _hide_policy():
+    if TRACING_PAYLOADS == "none":
+        return True
+    if TRACING_PAYLOADS == "capped":
+        return cap_payload
+    return None
+
+_client = None
+
+def get_client():
+    global _client
+    if _client is None:
+        policy = _hide_policy()
+        _client = Client(
+            auto_batch_tracing=True,
+            hide_inputs=policy,
+            hide_outputs=policy,
+            max_batch_size_bytes=TRACING_BATCH_MAX_BYTES,
+        )
+    return _client
+
+def traced(process_inputs=None, **traceable_kwargs):
+    """
+    Trace a sampled share of calls to an async function or async generator
+    function. process_inputs trims the arguments before they are recorded.
+    """
+    def decorate(fn):
+        if not TRACING_ENABLED:
+            return fn
+        traced_fn = None
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            nonlocal traced_fn
+            TRACING_STATS["calls"] += 1
+            if random.random() >= TRACING_SAMPLE_RATE:
+                return fn(*args, **kwargs)
+            TRACING_STATS["sampled"] += 1
+            if traced_fn is None:
+                traced_fn = traceable(
+                    client=get_client(), enabled=True, process_inputs=process_inputs, **traceable_kwargs
+                )(fn)
+            return traced_fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def annotate_run(name=None, **metadata):
+    """Rename the current run and add metadata; a no-op outside a sampled call."""
+    if not TRACING_ENABLED:
+        return
+    run = get_current_run_tree()
+    if run is None:
+        return
+    if name:
+        run.name = name
+    run.metadata.update(metadata)
+
+def tracing_stats():
+    queue = _client.tracing_queue if _client is not None else None
+    return {
+        **TRACING_STATS,
+        "enabled": TRACING_ENABLED,
+        "sample_rate": TRACING_SAMPLE_RATE,
+        "queued": queue.qsize() if queue is not None else 0,
+    }
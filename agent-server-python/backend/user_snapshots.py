@@ -0,0 +1,337 @@
+"""
+Warm per-user context snapshots kept current by listeners.
+
+Instead of reading profile, goals and recent moods on every turn, the first
+request for a user subscribes to changes on those three sources and keeps an
+in-memory snapshot that every later turn reads. Each change bumps the
+snapshot's version; rendered prompt text is memoized per version. Users idle
+for longer than `idle_seconds` are unsubscribed and dropped.
+
+Two listener sources are provided: FirestoreListenerSource (on_snapshot
+watches) and LocalListenerSource, an in-memory stand-in for offline use.
+"""
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from backend.firestore_client import get_db
+from backend.retrieval import GOAL, NOTE, goal_text, note_text
+
+PROFILE, GOALS, MOODS = "profile", "goals", "moods"
+MEMO_MAX_KEYS = 16
+
+
+class UserSnapshot:
+    def __init__(self, user_id, mood_aggregate=None, retrieval_index=None):
+        self.user_id = user_id
+        self.profile = {}
+        self.goals = {}   # doc id -> goal
+        self.moods = {}   # doc id -> mood entry
+        self.mood_aggregate = mood_aggregate  # kept in step with moods
+        self.retrieval_index = retrieval_index  # kept in step with goals and notes
+        self.version = 0
+        self.last_access = time.monotonic()
+        self.unsubscribe = None
+        self._loaded = set()
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._rendered = {}  # version-scoped memo, see memo()
+
+    def apply(self, kind, doc_id, data):
+        """Apply one change; data None means the document was removed."""
+        with self._lock:
+            if kind == PROFILE:
+                self.profile = data or {}
+            else:
+                docs = self.goals if kind == GOALS else self.moods
+                previous = docs.pop(doc_id, None) if data is None else docs.get(doc_id)
+                if data is not None:
+                    docs[doc_id] = {**data, "id": doc_id} if kind == GOALS else data
+                if kind == MOODS and self.mood_aggregate is not None:
+                    if previous is not None:
+                        self.mood_aggregate.remove(previous)
+                    if data is not None:
+                        self.mood_aggregate.add(data)
+                if self.retrieval_index is not None:
+                    self._index(kind, doc_id, data)
+            self.version += 1
+            self._rendered = {}
+
+    def _index(self, kind, doc_id, data):
+        if kind == GOALS and data is not None:
+            self.retrieval_index.add(GOAL, doc_id, self.goals[doc_id], goal_text(data))
+        elif kind == MOODS and data is not None and data.get("note"):
+            self.retrieval_index.add(NOTE, doc_id, data, note_text(data))
+        else:
+            self.retrieval_index.remove(GOAL if kind == GOALS else NOTE, doc_id)
+
+    def loaded(self, kind):
+        """A source has delivered its initial state."""
+        with self._lock:
+            self._loaded.add(kind)
+            if len(self._loaded) == 3:
+                self._ready.set()
+
+    def wait_ready(self, timeout):
+        return self._ready.wait(timeout)
+
+    def user_data(self):
+        """The same shape get_user_data_async returns, plus the snapshot itself."""
+        with self._lock:
+            return {
+                "profile": self.profile,
+                "goals": list(self.goals.values()),
+                "recent_moods": list(self.moods.values()),
+                "mood_aggregate": self.mood_aggregate,
+                "retrieval_index": self.retrieval_index,
+                "_snapshot": self,
+            }
+
+    def memo(self, key, render):
+        """
+        render() once per snapshot version and key. Keys must not depend on
+        the message; past MEMO_MAX_KEYS further keys are rendered uncached.
+        """
+        with self._lock:
+            rendered = self._rendered
+            version = self.version
+        if key in rendered:
+            return rendered[key]
+        value = render()
+        with self._lock:
+            if self.version == version and len(self._rendered) < MEMO_MAX_KEYS:
+                self._rendered[key] = value
+        return value
+
+
+class LocalListenerSource:
+    """
+    In-memory stand-in for Firestore listeners. Writes through put_*/remove_*
+    are delivered to subscribers synchronously, as on_snapshot would deliver
+    them asynchronously.
+    """
+
+    def __init__(self):
+        self._docs = {}         # (user_id, kind) -> {doc id: data}
+        self._subscribers = {}  # user_id -> [callback]
+        self._lock = threading.Lock()
+
+    def _write(self, user_id, kind, doc_id, data):
+        with self._lock:
+            docs = self._docs.setdefault((user_id, kind), {})
+            if data is None:
+                docs.pop(doc_id, None)
+            else:
+                docs[doc_id] = data
+            callbacks = list(self._subscribers.get(user_id, []))
+        for callback in callbacks:
+            callback(kind, doc_id, data)
+
+    def set_profile(self, user_id, data):
+        self._write(user_id, PROFILE, "general", data)
+
+    def put_goal(self, user_id, goal_id, data):
+        self._write(user_id, GOALS, goal_id, data)
+
+    def remove_goal(self, user_id, goal_id):
+        self._write(user_id, GOALS, goal_id, None)
+
+    def put_mood(self, user_id, mood_id, data):
+        self._write(user_id, MOODS, mood_id, data)
+
+    def listen(self, user_id, on_change, on_loaded):
+        with self._lock:
+            initial = {kind: dict(self._docs.get((user_id, kind), {})) for kind in (PROFILE, GOALS, MOODS)}
+            self._subscribers.setdefault(user_id, []).append(on_change)
+        for kind, docs in initial.items():
+            for doc_id, data in docs.items():
+                on_change(kind, doc_id, data)
+            on_loaded(kind)
+
+        def unsubscribe():
+            with self._lock:
+                self._subscribers.get(user_id, []).remove(on_change)
+        return unsubscribe
+
+
+class FirestoreListenerSource:
+    """
+    on_snapshot watches on the profile doc, the user's goals and recent moods.
+    With legacy_string_dates, mood entries whose endDate is an ISO string
+    get a second, string-bounded watch, as in get_recent_mood_entries.
+    """
+
+    def __init__(self, mood_days=60, legacy_string_dates=False):
+        self.mood_days = mood_days
+        self.legacy_string_dates = legacy_string_dates
+
+    def listen(self, user_id, on_change, on_loaded):
+        db = get_db()
+
+        def on_profile(docs, changes, read_time):
+            for doc in docs:
+                on_change(PROFILE, doc.id, doc.to_dict() if doc.exists else None)
+            on_loaded(PROFILE)
+
+        def on_query(kind):
+            # A kind is loaded once every watch feeding it has delivered
+            first = [True]
+
+            def callback(docs, changes, read_time):
+                for change in changes:
+                    removed = change.type.name == "REMOVED"
+                    on_change(kind, change.document.id, None if removed else change.document.to_dict())
+                if first[0]:
+                    first[0] = False
+                    with lock:
+                        pending[kind] -= 1
+                        done = pending[kind] == 0
+                    if done:
+                        on_loaded(kind)
+            return callback
+
+        # The mood window is fixed when the watch starts; listeners are
+        # short-lived and old entries are dropped again when rendering.
+        min_date = datetime.now(timezone.utc) - timedelta(days=self.mood_days)
+        moods_ref = db.collection("mood_entries").document("entries").collection(user_id)
+        mood_filters = [FieldFilter("endDate", ">=", min_date)]
+        if self.legacy_string_dates:
+            # Firestore only compares values of the same type, so string
+            # dates need their own bound, widened by a day for UTC offsets
+            mood_filters.append(FieldFilter("endDate", ">=", (min_date - timedelta(days=1)).isoformat()))
+        lock = threading.Lock()
+        pending = {GOALS: 1, MOODS: len(mood_filters)}
+        watches = [
+            db.collection("users").document(user_id).collection("profile").document("general")
+              .on_snapshot(on_profile),
+            db.collection("goals").where(filter=FieldFilter("user_id", "==", user_id))
+              .on_snapshot(on_query(GOALS)),
+        ]
+        watches += [moods_ref.where(filter=f).on_snapshot(on_query(MOODS)) for f in mood_filters]
+
+        def unsubscribe():
+            for watch in watches:
+                watch.unsubscribe()
+        return unsubscribe
+
+
+class SnapshotStore:
+    def __init__(self, source, idle_seconds=900.0, max_users=2000, initial_timeout=2.0,
+                 new_mood_aggregate=None, new_retrieval_index=None, retry_seconds=60.0):
+        self.source = source
+        self.new_mood_aggregate = new_mood_aggregate
+        self.new_retrieval_index = new_retrieval_index
+        self.idle_seconds = idle_seconds
+        self.max_users = max_users
+        self.initial_timeout = initial_timeout
+        self.retry_seconds = retry_seconds
+        self._snapshots = {}
+        self._failed = {}  # user_id -> when its listener last failed to load
+        self._lock = threading.Lock()
+        self._swept_at = time.monotonic()
+        self.started = 0
+        self.expired = 0
+        self.hits = 0
+        self.cold_timeouts = 0
+        self.skipped = 0
+
+    def get(self, user_id):
+        """
+        The user's snapshot, subscribing on first use. Returns None when the
+        initial state did not arrive within `initial_timeout`; the listener is
+        then dropped and the user is not retried for `retry_seconds`.
+        """
+        self._sweep()
+        with self._lock:
+            failed_at = self._failed.get(user_id)
+            if failed_at is not None:
+                if time.monotonic() - failed_at < self.retry_seconds:
+                    self.skipped += 1
+                    return None
+                del self._failed[user_id]
+            snapshot = self._snapshots.get(user_id)
+            if snapshot is None:
+                snapshot = UserSnapshot(
+                    user_id,
+                    self.new_mood_aggregate() if self.new_mood_aggregate else None,
+                    self.new_retrieval_index() if self.new_retrieval_index else None,
+                )
+                self._snapshots[user_id] = snapshot
+                start = True
+            else:
+                start = False
+                self.hits += 1
+        snapshot.last_access = time.monotonic()
+        if start:
+            self.started += 1
+            try:
+                snapshot.unsubscribe = self.source.listen(user_id, snapshot.apply, snapshot.loaded)
+            except Exception as e:
+                print(f"Snapshot listener error for {user_id}: {e}")
+                self._fail(user_id, snapshot)
+                return None
+            if self._snapshots.get(user_id) is not snapshot:
+                # Dropped by a timed-out waiter while subscribing
+                snapshot.unsubscribe()
+                return None
+        if not snapshot.wait_ready(self.initial_timeout):
+            self.cold_timeouts += 1
+            print(f"Snapshot for {user_id} not loaded within {self.initial_timeout}s, dropping listener")
+            self._fail(user_id, snapshot)
+            return None
+        return snapshot
+
+    def _fail(self, user_id, snapshot):
+        with self._lock:
+            if len(self._failed) >= self.max_users:
+                self._failed.clear()
+            self._failed[user_id] = time.monotonic()
+        self._drop(user_id, snapshot)
+
+    def peek(self, user_id):
+        """The user's snapshot if one is live, without subscribing."""
+        return self._snapshots.get(user_id)
+
+    def _drop(self, user_id, snapshot=None):
+        """Unsubscribe and forget the user's snapshot (only if it is `snapshot`, when given)."""
+        with self._lock:
+            current = self._snapshots.get(user_id)
+            if current is None or (snapshot is not None and current is not snapshot):
+                return
+            snapshot = self._snapshots.pop(user_id)
+        if snapshot is not None and snapshot.unsubscribe is not None:
+            try:
+                snapshot.unsubscribe()
+            except Exception as e:
+                print(f"Snapshot unsubscribe error for {user_id}: {e}")
+
+    def _sweep(self):
+        now = time.monotonic()
+        if now - self._swept_at < min(60.0, self.idle_seconds):
+            return
+        self._swept_at = now
+        with self._lock:
+            by_age = sorted(self._snapshots.values(), key=lambda s: s.last_access)
+            idle = [s.user_id for s in by_age if now - s.last_access > self.idle_seconds]
+            # Also cap how many users are watched at once, oldest first
+            overflow = max(0, len(by_age) - len(idle) - self.max_users)
+            idle += [s.user_id for s in by_age[len(idle):len(idle) + overflow]]
+        for user_id in idle:
+            self.expired += 1
+            self._drop(user_id)
+
+    def close(self):
+        for user_id in list(self._snapshots):
+            self._drop(user_id)
+
+    def stats(self):
+        return {
+            "active": len(self._snapshots),
+            "started": self.started,
+            "hits": self.hits,
+            "expired": self.expired,
+            "cold_timeouts": self.cold_timeouts,
+            "skipped": self.skipped,
+        }
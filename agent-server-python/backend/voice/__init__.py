@@ -1,9 +1,13 @@
 import openai
 import os
 from dotenv import load_dotenv
+from openai import AsyncOpenAI
 
 load_dotenv()
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
 if not openai.api_key:
     raise ValueError("OPENAI_API_KEY is not set. Please check your .env file.")
+
+# Shared async client so Whisper/TTS calls never block the event loop
+async_client = AsyncOpenAI(api_key=openai.api_key)
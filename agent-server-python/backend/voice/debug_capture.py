@@ -0,0 +1,34 @@
+"""
+Opt-in, sampled capture of received voice uploads for debugging.
+
+Each captured upload gets its own file name, and the copy runs in a worker
+thread, so concurrent requests neither race on one file nor block the loop.
+"""
+import asyncio
+import os
+import random
+import shutil
+import uuid
+from datetime import datetime, timezone
+from backend.config import VOICE_DEBUG_SAMPLE_RATE, VOICE_DEBUG_DIR
+
+def _copy_upload(file_obj, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    file_obj.seek(0)
+    with open(path, "wb") as out:
+        shutil.copyfileobj(file_obj, out)
+    file_obj.seek(0)
+
+async def maybe_capture_upload(file_obj, file_ext: str = ".m4a"):
+    """Copy the upload to VOICE_DEBUG_DIR for a VOICE_DEBUG_SAMPLE_RATE share of requests."""
+    if VOICE_DEBUG_SAMPLE_RATE <= 0 or random.random() >= VOICE_DEBUG_SAMPLE_RATE:
+        return None
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    path = os.path.join(VOICE_DEBUG_DIR, f"{stamp}-{uuid.uuid4().hex[:8]}{file_ext}")
+    try:
+        await asyncio.to_thread(_copy_upload, file_obj, path)
+        print("Captured voice upload:", path)
+        return path
+    except Exception as e:
+        print("Voice debug capture error:", e)
+        return None
@@ -0,0 +1,30 @@
+"""
+Helpers for streamed multipart/mixed voice responses.
+
+A response is a sequence of parts separated by a per-response boundary: JSON
+parts carry text (transcript, reply), audio parts carry raw mp3 bytes written
+as they arrive from TTS.
+"""
+import json
+import uuid
+
+def new_boundary() -> str:
+    return f"tabi-{uuid.uuid4().hex}"
+
+def content_type(boundary: str) -> str:
+    return f"multipart/mixed; boundary={boundary}"
+
+def part_header(boundary: str, part_type: str, headers: dict = None) -> bytes:
+    lines = [f"--{boundary}", f"Content-Type: {part_type}"]
+    for name, value in (headers or {}).items():
+        lines.append(f"{name}: {value}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode()
+
+def json_part(boundary: str, data: dict) -> bytes:
+    return part_header(boundary, "application/json") + json.dumps(data).encode() + b"\r\n"
+
+def part_end() -> bytes:
+    return b"\r\n"
+
+def closing(boundary: str) -> bytes:
+    return f"--{boundary}--\r\n".encode()
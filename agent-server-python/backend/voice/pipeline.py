@@ -0,0 +1,72 @@
+"""
+Sentence-pipelined TTS: turn a stream of LLM text deltas into sentences and
+synthesize them concurrently, yielding audio segments in reply order.
+"""
+import asyncio
+import re
+from backend.voice.tts import synthesize_speech
+
+# End of sentence: terminal punctuation (plus closing quotes/brackets) followed
+# by whitespace, or a line break. Requiring whitespace keeps "3.5" intact.
+_BOUNDARY = re.compile(r"[.!?]+[\"')\]]*\s+|\n+")
+
+async def split_sentences(deltas, min_chars: int = 20):
+    """
+    Group an async stream of text deltas into sentences. Fragments shorter
+    than `min_chars` are merged into the next sentence so TTS isn't called
+    for a lone "Sure!".
+    """
+    buffer = ""
+    async for delta in deltas:
+        buffer += delta
+        cut = 0
+        for match in _BOUNDARY.finditer(buffer):
+            sentence = buffer[cut:match.end()].strip()
+            if len(sentence) >= min_chars:
+                yield sentence
+                cut = match.end()
+        buffer = buffer[cut:]
+    if buffer.strip():
+        yield buffer.strip()
+
+async def pipelined_speech(sentences, voice: str = "alloy", window: int = 3):
+    """
+    Yield (sentence, audio_bytes) in order while up to `window` sentences are
+    being synthesized at once. Sentences keep being read from the LLM stream
+    while earlier audio is still in flight.
+    """
+    slots = asyncio.Semaphore(window)
+    queue = asyncio.Queue()
+    done = object()
+
+    async def produce():
+        try:
+            async for sentence in sentences:
+                await slots.acquire()
+                task = asyncio.create_task(synthesize_speech(sentence, voice))
+                await queue.put((sentence, task))
+        except Exception as e:
+            await queue.put(e)
+        finally:
+            await queue.put(done)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            sentence, task = item
+            try:
+                audio = await task
+            finally:
+                slots.release()
+            yield sentence, audio
+    finally:
+        producer.cancel()
+        while not queue.empty():
+            item = queue.get_nowait()
+            if isinstance(item, tuple):
+                item[1].cancel()
@@ -1,13 +1,19 @@
-import openai
 import io
+from backend.voice import async_client
+from backend.metrics import span
 
-async def transcribe_audio(audio_bytes: bytes, file_ext: str = ".m4a") -> str:
-    file_obj = io.BytesIO(audio_bytes)
-    file_obj.name = "audio" + file_ext
-    transcript_resp = openai.audio.transcriptions.create(
-        model="whisper-1",
-        file=file_obj,
-        response_format="text"
-    )
+async def transcribe_audio(audio, file_ext: str = ".m4a") -> str:
+    """
+    Transcribe raw bytes or a readable binary file object. File objects (e.g.
+    an upload's spooled temp file) are streamed to Whisper without copying.
+    """
+    if isinstance(audio, (bytes, bytearray)):
+        audio = io.BytesIO(audio)
+    with span("stt"):
+        transcript_resp = await async_client.audio.transcriptions.create(
+            model="whisper-1",
+            file=("audio" + file_ext, audio),
+            response_format="text"
+        )
     # transcript_resp is just a string if you use response_format="text"
     return transcript_resp
@@ -1,9 +1,28 @@
-import openai
+import time
+from backend.voice import async_client
+from backend.metrics import span, observe_stage
+
+# Bytes per chunk when relaying streamed TTS audio to the client
+TTS_STREAM_CHUNK_SIZE = 16 * 1024
 
 async def synthesize_speech(text: str, voice: str = "alloy") -> bytes:
-    tts_resp = openai.audio.speech.create(
+    with span("tts"):
+        tts_resp = await async_client.audio.speech.create(
+            model="tts-1",
+            voice=voice,
+            input=text
+        )
+    return tts_resp.content
+
+async def stream_speech(text: str, voice: str = "alloy", chunk_size: int = TTS_STREAM_CHUNK_SIZE):
+    """Yield mp3 bytes as OpenAI produces them instead of buffering the whole clip."""
+    start = time.perf_counter()
+    async with async_client.audio.speech.with_streaming_response.create(
         model="tts-1",
         voice=voice,
         input=text
-    )
-    return tts_resp.content
+    ) as tts_resp:
+        # Until the audio starts; the rest is paced by the client reading it
+        observe_stage("tts_first_byte", time.perf_counter() - start)
+        async for chunk in tts_resp.iter_bytes(chunk_size):
+            yield chunk
@@ -0,0 +1,122 @@
+"""
+Correctness and speed of the rule-based goal and mood extractors.
+
+    python -m benchmarks.extraction_benchmark
+
+Checks every case in fixtures/extraction_cases.jsonl against
+parse_goal_details / _find_emotions / _find_mood (only the fields a case
+lists are checked), then times the single-pass matchers against the previous
+per-keyword loops, kept below for comparison.
+"""
+import argparse
+import json
+import re
+import statistics
+import time
+from pathlib import Path
+
+from backend.goal_extraction import CATEGORY_KEYWORDS, parse_goal_details
+from backend.mood_extraction import COMMON_EMOTIONS, MOODS, _find_emotions, _find_mood
+
+FIXTURE = Path(__file__).parent / "fixtures" / "extraction_cases.jsonl"
+GOAL_FIELDS = ("category_slug", "timeframe", "duration_weeks", "goal_name")
+
+def _load(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+# Previous implementations, for the speed comparison only
+
+def legacy_goal_fields(user_message):
+    message_lower = user_message.lower()
+    details = {"timeframe": "Month", "duration_weeks": 6, "goal_name": None, "category_slug": None}
+    timeframe_patterns = {
+        "week": ["week", "weekly", "7 days"],
+        "month": ["month", "monthly", "30 days"],
+        "quarter": ["quarter", "quarterly", "3 months"],
+        "year": ["year", "yearly", "annual", "12 months"]
+    }
+    for timeframe, patterns in timeframe_patterns.items():
+        if any(pattern in message_lower for pattern in patterns):
+            details["timeframe"] = timeframe.capitalize()
+            break
+    duration_match = re.search(r'(\d+)\s*(week|month|day)s?', message_lower)
+    if duration_match:
+        num, unit = duration_match.groups()
+        details["duration_weeks"] = {"week": int(num), "month": int(num) * 4}.get(unit, max(1, int(num) // 7))
+    for pattern in [
+        r'(?:goal|want|need|plan) (?:to|is to) (.+?)(?:\.|,|$)',
+        r'i want to (.+?)(?:\.|,|$)',
+        r'help me (?:to )?(.+?)(?:\.|,|$)',
+        r'set a goal (?:to )?(.+?)(?:\.|,|$)',
+        r'my goal is (?:to )?(.+?)(?:\.|,|$)',
+        r'add (.+?) to my goals?',
+        r'can you add (.+?) to my goals?'
+    ]:
+        match = re.search(pattern, message_lower)
+        if match:
+            details["goal_name"] = re.sub(r'\s+', ' ', match.group(1).strip())[:50]
+            break
+    for category, keywords in CATEGORY_KEYWORDS.items():
+        if any(keyword in message_lower for keyword in keywords):
+            details["category_slug"] = category
+            break
+    return details
+
+def legacy_find_emotions(text):
+    return list({e for e in COMMON_EMOTIONS if re.search(r'\b' + re.escape(e) + r'\b', text, re.IGNORECASE)})
+
+def legacy_find_mood(text):
+    for mood in MOODS:
+        if re.search(r'\b' + re.escape(mood) + r'\b', text, re.IGNORECASE):
+            return mood
+    return None
+
+def check(rows):
+    failures = []
+    for row in rows:
+        message = row["message"]
+        if any(field in row for field in GOAL_FIELDS):
+            details = parse_goal_details(message)
+            for field in GOAL_FIELDS:
+                if field in row and details[field] != row[field]:
+                    failures.append((message, field, row[field], details[field]))
+        if "emotions" in row and sorted(_find_emotions(message)) != sorted(row["emotions"]):
+            failures.append((message, "emotions", row["emotions"], _find_emotions(message)))
+        if "mood" in row and _find_mood(message) != row["mood"]:
+            failures.append((message, "mood", row["mood"], _find_mood(message)))
+    return failures
+
+def _time_us(fn, messages, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for message in messages:
+            fn(message)
+        samples.append((time.perf_counter() - start) * 1e6 / len(messages))
+    return statistics.median(samples)
+
+def main(path, repeat):
+    rows = _load(path)
+    failures = check(rows)
+    print(f"fixture: {path} ({len(rows)} cases), {len(failures)} failures")
+    for message, field, expected, got in failures:
+        print(f"  {message!r}: {field} expected {expected!r}, got {got!r}")
+
+    messages = [row["message"] for row in rows]
+    pairs = [
+        ("goal fields", legacy_goal_fields, parse_goal_details),
+        ("emotions", legacy_find_emotions, _find_emotions),
+        ("mood", legacy_find_mood, _find_mood),
+    ]
+    for name, old, new in pairs:
+        old_us, new_us = _time_us(old, messages, repeat), _time_us(new, messages, repeat)
+        print(f"{name:12s} legacy={old_us:.1f}us single-pass={new_us:.1f}us speedup={old_us / new_us:.1f}x")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fixture", default=str(FIXTURE))
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    raise SystemExit(main(args.fixture, args.repeat))
@@ -0,0 +1,75 @@
+"""
+Minimal OpenAI-compatible chat completions server with tunable latency and
+failures, for exercising the model pool without real providers.
+
+    python -m benchmarks.fake_llm_server --port 8101 --latency-ms 300 --tail-ms 3000 --tail-rate 0.1
+
+Point the app at it with OPENAI_BASE_URL=http://localhost:8101/v1 and/or
+DEEPSEEK_BASE_URL=http://localhost:8102/v1.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Returned for structured-output (response_format) requests, e.g. the preflight
+STRUCTURED_REPLY = {"route": "main", "intent": "chat", "goal": None, "mood": None}
+
+def create_app(latency_ms=300.0, tail_ms=0.0, tail_rate=0.0, error_rate=0.0, reply="Hello from the fake model.",
+               structured_reply=STRUCTURED_REPLY):
+    app = FastAPI()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        delay = tail_ms if random.random() < tail_rate else latency_ms
+        await asyncio.sleep(delay / 1000)
+        if random.random() < error_rate:
+            return JSONResponse({"error": {"message": "fake upstream failure", "type": "server_error"}}, status_code=500)
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        model = body.get("model", "fake")
+        content = json.dumps(structured_reply) if body.get("response_format") else reply
+        usage = {"prompt_tokens": 100, "completion_tokens": 8, "total_tokens": 108}
+        if not body.get("stream"):
+            return {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": usage,
+            }
+
+        async def events():
+            for word in content.split(" "):
+                chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                         "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(0.01)
+            last = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage}
+            yield f"data: {json.dumps(last)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+if __name__ == "__main__":
+    import uvicorn
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8101)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--tail-ms", type=float, default=0)
+    parser.add_argument("--tail-rate", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    args = parser.parse_args()
+    uvicorn.run(
+        create_app(args.latency_ms, args.tail_ms, args.tail_rate, args.error_rate),
+        host="127.0.0.1", port=args.port, log_level="warning",
+    )
@@ -0,0 +1,117 @@
+"""
+Per-call cost of the instrumentation: a bare histogram observation, a stage
+span (inside and outside a request), a model span with token counting, the
+disabled no-op path, and the ASGI middleware around a trivial app. Fails
+(exit code 1) if a single observation or span costs more than --budget-us
+microseconds.
+
+    python -m benchmarks.metrics_overhead_benchmark
+"""
+import argparse
+import asyncio
+import sys
+import time
+from types import SimpleNamespace
+
+from backend import metrics
+
+def _per_call_us(fn, n):
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(n):
+            fn()
+        best = min(best, (time.perf_counter() - start) / n * 1e6)
+    return best
+
+def _empty():
+    pass
+
+def _span():
+    with metrics.span("bench"):
+        pass
+
+def _noop_span():
+    with metrics._NOOP:
+        pass
+
+_RESPONSE = SimpleNamespace(usage_metadata={"input_tokens": 1200, "output_tokens": 80})
+
+def _model_span():
+    with metrics.model_span("bench-model", "bench") as call:
+        call.record(_RESPONSE)
+
+def _in_request(fn):
+    def run():
+        token = metrics._request_spans.set([])
+        try:
+            fn()
+        finally:
+            metrics._request_spans.reset(token)
+    return run
+
+async def _app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+def _asgi_us(app, n):
+    scope = {"type": "http", "method": "GET", "path": "/bench", "headers": []}
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    async def run():
+        best = float("inf")
+        for _ in range(5):
+            start = time.perf_counter()
+            for _ in range(n):
+                await app(scope, receive, send)
+            best = min(best, (time.perf_counter() - start) / n * 1e6)
+        return best
+    return asyncio.run(run())
+
+def _server_timing_us(n):
+    enabled = metrics.SERVER_TIMING_ENABLED
+    metrics.SERVER_TIMING_ENABLED = True
+
+    async def app(scope, receive, send):
+        for stage in ("route", "context", "build_prompt", "llm_reply"):
+            metrics.observe_stage(stage, 0.01)
+        await _app(scope, receive, send)
+    try:
+        return _asgi_us(metrics.MetricsMiddleware(app), n)
+    finally:
+        metrics.SERVER_TIMING_ENABLED = enabled
+
+def main(n, budget_us):
+    baseline = _per_call_us(_empty, n)
+    rows = [
+        ("histogram observe", _per_call_us(lambda: metrics.STAGE_SECONDS.observe(("bench",), 0.012), n) - baseline),
+        ("span", _per_call_us(_span, n) - baseline),
+        ("span in a request", _per_call_us(_in_request(_span), n) - _per_call_us(_in_request(_empty), n)),
+        ("model span + tokens", _per_call_us(_model_span, n) - baseline),
+        ("disabled (no-op) span", _per_call_us(_noop_span, n) - baseline),
+    ]
+    per_span = max(us for _, us in rows)
+    bare = _asgi_us(_app, n // 10)
+    wrapped = _asgi_us(metrics.MetricsMiddleware(_app), n // 10)
+    rows.append(("middleware per request", wrapped - bare))
+    rows.append(("4 spans + Server-Timing", _server_timing_us(n // 10) - bare))
+
+    print(f"metrics enabled: {metrics.METRICS_ENABLED}")
+    for name, us in rows:
+        print(f"{name:>28}: {us:7.3f} us")
+    if per_span > budget_us:
+        print(f"FAIL: a span costs more than {budget_us} us")
+        sys.exit(1)
+    print(f"OK: every span under {budget_us} us")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=200_000)
+    parser.add_argument("--budget-us", type=float, default=10.0)
+    args = parser.parse_args()
+    main(args.n, args.budget_us)
@@ -0,0 +1,67 @@
+"""
+Tail latency of the model pool with and without hedging, against two local
+fake providers (see fake_llm_server.py): a primary with a slow tail and a
+steady secondary.
+
+    python -m benchmarks.model_pool_benchmark --requests 200
+"""
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+
+import uvicorn
+from langchain_core.messages import HumanMessage
+from langchain_openai import ChatOpenAI
+
+from backend.model_pool import ModelBackend, ModelPool
+from benchmarks.fake_llm_server import create_app
+
+def _serve(app, port):
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+def _client(port):
+    return ChatOpenAI(model="fake", api_key="fake", base_url=f"http://127.0.0.1:{port}/v1", max_retries=0)
+
+async def run(pool, n):
+    latencies = []
+    for _ in range(n):
+        start = time.perf_counter()
+        await pool.ainvoke("physical", [HumanMessage(content="hi")])
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(0.95 * (len(latencies) - 1))],
+        "p99": latencies[int(0.99 * (len(latencies) - 1))],
+    }
+
+async def compare(n, primary_port, secondary_port):
+    order = {"physical": ["primary", "secondary"], "default": ["primary", "secondary"]}
+    for hedge in (False, True):
+        pool = ModelPool(
+            [ModelBackend("primary", _client(primary_port)), ModelBackend("secondary", _client(secondary_port))],
+            order, hedge=hedge, default_hedge_ms=200, min_hedge_ms=100,
+        )
+        result = await run(pool, n)
+        print(f"hedging={'on ' if hedge else 'off'} "
+              + " ".join(f"{k}={v:.0f}ms" for k, v in result.items())
+              + f" hedges_fired={pool.hedges_fired} hedges_won={pool.hedges_won}")
+
+def main(n, primary_port, secondary_port):
+    _serve(create_app(latency_ms=60, tail_ms=1500, tail_rate=0.1), primary_port)
+    _serve(create_app(latency_ms=120), secondary_port)
+    # One loop for both runs: langchain_openai shares a cached httpx client per base URL.
+    asyncio.run(compare(n, primary_port, secondary_port))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--primary-port", type=int, default=8101)
+    parser.add_argument("--secondary-port", type=int, default=8102)
+    args = parser.parse_args()
+    main(args.requests, args.primary_port, args.secondary_port)
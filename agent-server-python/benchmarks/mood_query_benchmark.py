@@ -0,0 +1,129 @@
+"""
+Show how mood-history fetch cost scales with collection size.
+
+Runs get_recent_mood_entries against an in-memory stand-in for Firestore that
+keeps a sorted endDate index (like the real single-field index) and counts
+documents read, next to the previous full-collection scan.
+
+    python -m benchmarks.mood_query_benchmark --sizes 100 1000 10000
+"""
+import argparse
+import bisect
+import time
+from datetime import datetime, timedelta, timezone
+
+from backend import mood_extraction
+
+
+class FakeDoc:
+    def __init__(self, data):
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class FakeQuery:
+    def __init__(self, collection, field_filter):
+        self.collection = collection
+        self.filter = field_filter
+        self.descending = False
+        self.max_results = None
+
+    def order_by(self, field, direction=None):
+        self.descending = direction == mood_extraction.firestore.Query.DESCENDING
+        return self
+
+    def limit(self, n):
+        self.max_results = n
+        return self
+
+    def stream(self):
+        # Firestore only compares values of the same type, so each type has
+        # its own slice of the index.
+        bound = self.filter.value
+        index = self.collection.index[type(bound)]
+        keys = [k for k, _ in index]
+        matches = index[bisect.bisect_left(keys, bound):]
+        if self.descending:
+            matches = matches[::-1]
+        for _, data in matches[:self.max_results]:
+            self.collection.reads += 1
+            yield FakeDoc(data)
+
+
+class FakeCollection:
+    def __init__(self, entries):
+        self.entries = entries
+        self.reads = 0
+        self.index = {datetime: [], str: []}
+        for data in entries:
+            self.index[type(data["endDate"])].append((data["endDate"], data))
+        for values in self.index.values():
+            values.sort(key=lambda item: item[0])
+
+    def where(self, filter):
+        return FakeQuery(self, filter)
+
+    def stream(self):
+        for data in self.entries:
+            self.reads += 1
+            yield FakeDoc(data)
+
+
+class FakeDB:
+    """Resolves mood_entries/entries/{uid} to a single FakeCollection."""
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def collection(self, name):
+        return self if name == "mood_entries" else self._collection
+
+    def document(self, name):
+        return self
+
+
+def _make_entries(n, legacy_share=0.1):
+    now = datetime.now(timezone.utc)
+    entries = []
+    for i in range(n):
+        # One entry a day going back in time
+        end_date = now - timedelta(days=i)
+        value = end_date.isoformat() if i % int(1 / legacy_share) == 0 else end_date
+        entries.append({"endDate": value, "mood": "good", "emotions": ["calm"], "note": f"entry {i}"})
+    return entries
+
+
+def _full_scan(collection, days=60):
+    min_date = datetime.now(timezone.utc) - timedelta(days=days)
+    recent = []
+    for doc in collection.stream():
+        data = doc.to_dict()
+        if mood_extraction._end_date_utc(data["endDate"]) >= min_date:
+            recent.append(data)
+    return recent
+
+
+def main(sizes):
+    print(f"{'entries':>8} | {'scan reads':>10} {'scan ms':>8} | {'range reads':>11} {'range ms':>8} | results")
+    for n in sizes:
+        collection = FakeCollection(_make_entries(n))
+        mood_extraction.db = FakeDB(collection)
+
+        start = time.perf_counter()
+        scanned = _full_scan(collection)
+        scan_ms = (time.perf_counter() - start) * 1000
+        scan_reads, collection.reads = collection.reads, 0
+
+        start = time.perf_counter()
+        ranged = mood_extraction.get_recent_mood_entries("bench-user", days=60)
+        range_ms = (time.perf_counter() - start) * 1000
+
+        print(f"{n:>8} | {scan_reads:>10} {scan_ms:>8.2f} | {collection.reads:>11} {range_ms:>8.2f} | {len(scanned)} / {len(ranged)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 50000])
+    main(parser.parse_args().sizes)
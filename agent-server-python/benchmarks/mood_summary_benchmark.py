@@ -0,0 +1,75 @@
+"""
+Mood context size and formatting time against the number of mood entries:
+one line per entry (all of them, and capped at CONTEXT_MAX_MOODS) versus the
+fixed-size aggregate summary, built from scratch and updated incrementally.
+
+    python -m benchmarks.mood_summary_benchmark
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from backend.config import CONTEXT_MAX_MOODS
+from backend.mood_aggregates import MoodAggregate
+from backend.rag_utils import _moods_text, latest_moods
+from backend.token_budget import count_tokens
+
+MOODS = ["good", "great", "ok", "fine", "bad", "sad", "happy", "neutral"]
+EMOTIONS = ["grateful", "calm", "anxious", "drained", "lonely", "excited", "hope", "overwhelmed"]
+
+def synthetic_entries(n, days=60, seed=0):
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "endDate": (now - timedelta(seconds=rng.uniform(0, days * 86400))).isoformat(),
+            "mood": rng.choice(MOODS),
+            "emotions": rng.sample(EMOTIONS, rng.randint(0, 3)),
+            "note": "Went for a walk after work and talked to a friend about the week " * rng.randint(0, 2),
+        }
+        for _ in range(n)
+    ]
+
+def _time_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+def main(sizes, repeat):
+    print(f"{'entries':>8} | {'all lines':>22} | {f'capped ({CONTEXT_MAX_MOODS})':>22} | {'summary (build)':>22} | {'summary (add 1)':>15}")
+    for n in sizes:
+        entries = synthetic_entries(n)
+        aggregate = MoodAggregate.from_entries(entries)
+        new_entry = synthetic_entries(1, days=1, seed=n)[0]
+
+        all_text = _moods_text(entries)
+        capped_text = _moods_text(latest_moods(entries, CONTEXT_MAX_MOODS))
+        summary_text = aggregate.summary()
+
+        all_ms = _time_ms(lambda: _moods_text(entries), repeat)
+        capped_ms = _time_ms(lambda: _moods_text(latest_moods(entries, CONTEXT_MAX_MOODS)), repeat)
+        build_ms = _time_ms(lambda: MoodAggregate.from_entries(entries).summary(), repeat)
+
+        def add_one():
+            aggregate.add(new_entry)
+            aggregate.summary()
+            aggregate.remove(new_entry)
+        add_ms = _time_ms(add_one, repeat)
+
+        print(
+            f"{n:>8} | {count_tokens(all_text):>6} tok {all_ms:>8.3f}ms | "
+            f"{count_tokens(capped_text):>6} tok {capped_ms:>8.3f}ms | "
+            f"{count_tokens(summary_text):>6} tok {build_ms:>8.3f}ms | {add_ms:>13.3f}ms"
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 60, 200, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    main(args.sizes, args.repeat)
@@ -0,0 +1,62 @@
+"""
+Latency of turn triage: the regular pipeline (router, goal-intent gate and
+goal extraction) against the single structured preflight call.
+
+    python -m benchmarks.preflight_benchmark --limit 20
+
+Calls the real models, so it needs OPENAI_API_KEY; or run it offline against
+benchmarks.fake_llm_server by setting OPENAI_BASE_URL=http://127.0.0.1:8101/v1.
+Reports per-message latency, model calls per message and route accuracy on
+the routing fixture for each mode.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from pathlib import Path
+
+from langchain_core.tracers.context import collect_runs
+
+from backend import llm_utils
+
+FIXTURE = Path(__file__).parent / "fixtures" / "routing_labeled.jsonl"
+
+def _load(path, limit):
+    with open(path, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    return rows[:limit] if limit else rows
+
+async def triage(message):
+    # What prepare_turn and get_reply do before the persona call
+    route, preflight = await llm_utils.route_turn(message)
+    await llm_utils.goal_clarification(route, [{"role": "user", "content": message}], preflight)
+    return route
+
+async def measure(use_preflight, rows):
+    llm_utils.PREFLIGHT_ENABLED = use_preflight
+    latencies, calls, correct = [], [], 0
+    for row in rows:
+        with collect_runs() as runs:
+            start = time.perf_counter()
+            route = await triage(row["message"])
+            latencies.append((time.perf_counter() - start) * 1000)
+        calls.append(len(runs.traced_runs))
+        correct += route == row["route"]
+    latencies.sort()
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    return (f"p50={statistics.median(latencies):.0f}ms p95={p95:.0f}ms "
+            f"model_calls/msg={statistics.mean(calls):.2f} route_accuracy={correct / len(rows):.1%}")
+
+async def main(path, limit):
+    rows = _load(path, limit)
+    print(f"fixture: {path} ({len(rows)} messages)")
+    print(f"pipeline:  {await measure(False, rows)}")
+    print(f"preflight: {await measure(True, rows)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fixture", default=str(FIXTURE))
+    parser.add_argument("--limit", type=int, default=0, help="only the first N messages")
+    args = parser.parse_args()
+    asyncio.run(main(args.fixture, args.limit))
@@ -0,0 +1,75 @@
+"""
+Replay a recorded log of conversation openers through the response cache.
+
+    python -m benchmarks.response_cache_replay                # offline embeddings
+    python -m benchmarks.response_cache_replay --openai       # text-embedding-3-small
+    python -m benchmarks.response_cache_replay --exact-only
+    python -m benchmarks.response_cache_replay --maxsize 16   # check memory stays bounded
+
+Every miss is stored as if the model had answered, so the report shows the
+hit rate the cache would reach on that traffic at the given threshold.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from backend.response_cache import ResponseCache
+
+LOG = Path(__file__).parent / "fixtures" / "conversation_log.jsonl"
+
+async def hashed_trigram_embedding(text, dim=512):
+    """Cheap offline stand-in for a sentence embedding: hashed char trigrams."""
+    vector = np.zeros(dim, dtype=np.float32)
+    padded = f"  {text} "
+    for i in range(len(padded) - 2):
+        bucket = int(hashlib.md5(padded[i:i + 3].encode()).hexdigest()[:8], 16) % dim
+        vector[bucket] += 1.0
+    return vector
+
+async def main(path, embed, threshold, maxsize):
+    cache = ResponseCache(ttl=3600, maxsize=maxsize, threshold=threshold, embed=embed)
+    with open(path, encoding="utf-8") as f:
+        turns = [json.loads(line) for line in f if line.strip()]
+    lookup_ms = []
+    for turn in turns:
+        history = [{"role": "user", "content": turn["message"]}]
+        start = time.perf_counter()
+        reply, probe = await cache.lookup(turn["route"], history)
+        lookup_ms.append((time.perf_counter() - start) * 1000)
+        if reply is None:
+            cache.store(probe, f"reply to: {turn['message']}")
+    stats = cache.stats()
+    print(f"log: {path} ({len(turns)} turns), threshold={threshold}")
+    print(f"exact hits: {stats['exact_hits']}  semantic hits: {stats['semantic_hits']}  misses: {stats['misses']}")
+    print(f"hit rate: {stats['hit_rate']:.1%}")
+    print(f"mean lookup: {sum(lookup_ms) / len(lookup_ms):.3f}ms")
+    indexed = sum(len(bucket) for bucket in cache._vectors.values())
+    print(f"entries: {stats['size']}  vectors: {indexed} in {len(cache._vectors)} buckets (maxsize {maxsize})")
+    if indexed > maxsize or any(not bucket for bucket in cache._vectors.values()):
+        print("FAIL: vector index outgrew the exact tier")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--log", default=str(LOG))
+    parser.add_argument("--threshold", type=float, default=None)
+    parser.add_argument("--maxsize", type=int, default=4096)
+    parser.add_argument("--openai", action="store_true", help="use OpenAI embeddings")
+    parser.add_argument("--exact-only", action="store_true")
+    args = parser.parse_args()
+    if args.exact_only:
+        embed, threshold = None, 1.0
+    elif args.openai:
+        from backend.config import embeddings, RESPONSE_CACHE_THRESHOLD
+        embed, threshold = embeddings.aembed_query, RESPONSE_CACHE_THRESHOLD
+    else:
+        embed, threshold = hashed_trigram_embedding, 0.8
+    if args.threshold is not None:
+        threshold = args.threshold
+    asyncio.run(main(args.log, embed, threshold, args.maxsize))
@@ -0,0 +1,95 @@
+"""
+Goal and note selection time against the number of indexed items: the word
+overlap ranking over every goal (rank_goals) versus the per-user BM25 index,
+built from scratch, queried, and updated with one new goal.
+
+    python -m benchmarks.retrieval_benchmark
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from backend.config import CONTEXT_MAX_GOALS
+from backend.rag_utils import rank_goals
+from backend.retrieval import GOAL, NOTE, build_index, goal_text, query_weights
+from backend.goal_extraction import CATEGORY_KEYWORDS
+
+VERBS = ["run", "save", "read", "meditate", "walk", "learn", "cook", "write", "call", "budget", "sleep", "swim"]
+OBJECTS = ["5k", "money", "books", "daily", "park", "spanish", "meals", "journal", "family", "expenses",
+           "earlier", "laps", "guitar", "course", "savings", "garden", "friends", "resume", "water", "stretching"]
+NOTES = ["felt anxious about work deadlines", "great run in the park this morning", "worried about rent and debt",
+         "had a calm evening reading", "argued with a friend", "slept badly again", "proud of saving this week"]
+QUERIES = [
+    ("I keep failing to save any money, what should I do?", "financial"),
+    ("how do I get better at running longer distances", "physical"),
+    ("I feel lonely lately and miss my friends", "social"),
+    ("any tips to stick with my spanish course?", "intellectual"),
+]
+
+def synthetic_items(n, seed=0):
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    goals, moods = [], []
+    for i in range(n):
+        when = now - timedelta(seconds=rng.uniform(0, 60 * 86400))
+        if i % 2:
+            moods.append({"id": f"m{i}", "endDate": when, "mood": "ok", "emotions": [], "note": rng.choice(NOTES)})
+        else:
+            name = f"{rng.choice(VERBS).title()} {rng.choice(OBJECTS)}"
+            description = " ".join(rng.choice(VERBS + OBJECTS) for _ in range(rng.randint(4, 10)))
+            goals.append({"id": f"g{i}", "goalName": name, "goalDescription": description, "startDate": when})
+    return goals, moods
+
+def _time_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+def main(sizes, repeat, top_k):
+    print(f"{'items':>7} | {'rank_goals p50/p95':>20} | {'bm25 build':>10} | {'bm25 query p50/p95':>20} | {'add 1':>8}")
+    for n in sizes:
+        goals, moods = synthetic_items(n)
+        index = build_index(goals, moods)
+        queries = [
+            (message, query_weights(message, route, CATEGORY_KEYWORDS.get(route, ()), 0.3))
+            for message, route in QUERIES
+        ]
+
+        def scan():
+            for message, _ in queries:
+                rank_goals(goals, message, CONTEXT_MAX_GOALS)
+
+        def search():
+            for _, weights in queries:
+                index.search(weights, GOAL, top_k)
+                index.search(weights, NOTE, 3)
+
+        new_goal = {"id": "new", "goalName": "Save for a bike", "goalDescription": "put money aside weekly"}
+
+        def add_one():
+            index.add(GOAL, "new", new_goal, goal_text(new_goal))
+
+        scan_p50, scan_p95 = _time_ms(scan, repeat)
+        build_ms, _ = _time_ms(lambda: build_index(goals, moods), max(1, repeat // 10))
+        search(), add_one()  # postings arrays are built on first use
+        query_p50, query_p95 = _time_ms(search, repeat)
+        add_ms, _ = _time_ms(add_one, repeat)
+        per = len(queries)
+        print(
+            f"{n:>7} | {scan_p50 / per:>8.3f} / {scan_p95 / per:>7.3f}ms | {build_ms:>8.1f}ms | "
+            f"{query_p50 / per:>8.3f} / {query_p95 / per:>7.3f}ms | {add_ms:>6.3f}ms"
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000, 20000])
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+    main(args.sizes, args.repeat, args.top_k)
@@ -0,0 +1,69 @@
+"""
+Compare the local fast router against the LLM router on a labeled fixture.
+
+    python -m benchmarks.router_benchmark            # local tier only
+    python -m benchmarks.router_benchmark --llm      # also call gpt-4o-mini
+
+Reports label agreement, local coverage at the configured confidence
+threshold, agreement between the two routers and per-call latency.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from pathlib import Path
+
+from backend.config import FAST_ROUTER_MIN_CONFIDENCE
+from backend.fast_router import classify
+
+FIXTURE = Path(__file__).parent / "fixtures" / "routing_labeled.jsonl"
+
+def _load(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def _latency(samples_ms):
+    samples_ms = sorted(samples_ms)
+    p95 = samples_ms[min(len(samples_ms) - 1, int(len(samples_ms) * 0.95))]
+    return f"p50={statistics.median(samples_ms):.3f}ms p95={p95:.3f}ms"
+
+async def main(path, use_llm, repeat):
+    rows = _load(path)
+    local, local_ms = [], []
+    for row in rows:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = classify(row["message"])
+            local_ms.append((time.perf_counter() - start) * 1000)
+        local.append(result)
+
+    confident = [(row, r) for row, r in zip(rows, local) if r[1] >= FAST_ROUTER_MIN_CONFIDENCE]
+    print(f"fixture: {path} ({len(rows)} messages)")
+    print(f"local latency: {_latency(local_ms)}")
+    print(f"local coverage @ {FAST_ROUTER_MIN_CONFIDENCE}: {len(confident) / len(rows):.1%}")
+    if confident:
+        correct = sum(row["route"] == r[0] for row, r in confident)
+        print(f"local accuracy on covered messages: {correct / len(confident):.1%}")
+
+    if not use_llm:
+        return
+    from backend.llm_utils import llm_route
+    llm, llm_ms = [], []
+    for row in rows:
+        start = time.perf_counter()
+        llm.append(await llm_route(row["message"]))
+        llm_ms.append((time.perf_counter() - start) * 1000)
+    print(f"llm latency: {_latency(llm_ms)}")
+    print(f"llm accuracy: {sum(row['route'] == r for row, r in zip(rows, llm)) / len(rows):.1%}")
+    agree = [r[0] == l for r, l in zip(local, llm) if r[1] >= FAST_ROUTER_MIN_CONFIDENCE]
+    if agree:
+        print(f"local/llm agreement on covered messages: {sum(agree) / len(agree):.1%}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fixture", default=str(FIXTURE))
+    parser.add_argument("--llm", action="store_true", help="also benchmark the gpt-4o-mini router")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.fixture, args.llm, args.repeat))
@@ -0,0 +1,61 @@
+"""
+SnapshotStore.get latency for a user whose listeners load normally and for
+one whose mood watch never delivers its initial state (a failed or denied
+watch). Fails (exit code 1) if a repeated get() for the stuck user waits
+for the initial timeout again instead of returning at once.
+
+    python -m benchmarks.snapshot_cold_start_benchmark --timeout 0.5
+"""
+import argparse
+import sys
+import time
+
+from backend.user_snapshots import LocalListenerSource, SnapshotStore, MOODS
+
+
+class StuckMoodsSource(LocalListenerSource):
+    """Delivers profile and goals but never reports moods as loaded."""
+
+    def listen(self, user_id, on_change, on_loaded):
+        def loaded(kind):
+            if kind != MOODS:
+                on_loaded(kind)
+        self.unsubscribed = False
+        unsubscribe = super().listen(user_id, on_change, loaded)
+
+        def wrapped():
+            self.unsubscribed = True
+            unsubscribe()
+        return wrapped
+
+def _get_ms(store, user_id):
+    start = time.perf_counter()
+    snapshot = store.get(user_id)
+    return snapshot, (time.perf_counter() - start) * 1000
+
+def main(timeout, calls):
+    healthy = LocalListenerSource()
+    healthy.set_profile("u", {"name": "Sam"})
+    store = SnapshotStore(healthy, initial_timeout=timeout)
+    rows = [("healthy", [_get_ms(store, "u") for _ in range(calls)])]
+
+    stuck = StuckMoodsSource()
+    stuck.set_profile("u", {"name": "Sam"})
+    stuck_store = SnapshotStore(stuck, initial_timeout=timeout)
+    rows.append(("stuck moods", [_get_ms(stuck_store, "u") for _ in range(calls)]))
+
+    for name, results in rows:
+        print(f"{name:>12}: " + "  ".join(f"{ms:7.1f}ms{'' if s is not None else ' (none)'}" for s, ms in results))
+    print(f"stuck store stats: {stuck_store.stats()}, listener unsubscribed: {stuck.unsubscribed}")
+    repeat_ms = max(ms for _, ms in rows[1][1][1:])
+    if repeat_ms >= timeout * 1000 / 2 or not stuck.unsubscribed:
+        print("FAIL: a stuck user is waited on again or its listener is kept")
+        sys.exit(1)
+    print("OK: a stuck user's listener is dropped and later calls return at once")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--timeout", type=float, default=0.5)
+    parser.add_argument("--calls", type=int, default=3)
+    args = parser.parse_args()
+    main(args.timeout, args.calls)
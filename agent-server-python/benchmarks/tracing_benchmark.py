@@ -0,0 +1,130 @@
+"""
+get_reply overhead with LangSmith tracing off, sampled and full.
+
+    python -m benchmarks.tracing_benchmark -n 200
+
+Each mode runs in its own process, since tracing settings are read at import.
+Models are served by benchmarks.fake_llm_server with no added latency, and
+runs are exported to a local sink that accepts and discards them, so the
+numbers are the in-process cost of a turn: wall time per call, and CPU per
+call including the background export thread.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+MODES = {
+    "off": {"TRACING_ENABLED": "false"},
+    "sampled": {"TRACING_ENABLED": "true", "TRACING_SAMPLE_RATE": "0.1", "TRACING_PAYLOADS": "capped"},
+    "full": {"TRACING_ENABLED": "true", "TRACING_SAMPLE_RATE": "1.0", "TRACING_PAYLOADS": "full"},
+}
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _serve(app, port):
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+def _langsmith_sink(received):
+    from fastapi import FastAPI, Request
+
+    app = FastAPI()
+
+    @app.get("/info")
+    async def info():
+        return {}
+
+    @app.post("/{path:path}")
+    async def accept(path: str, request: Request):
+        received["requests"] += 1
+        received["bytes"] += len(await request.body())
+        return {}
+
+    return app
+
+def _user_data(goals=40, moods=120):
+    return {
+        "profile": {"name": "Sam", "age": 34, "gender": "f"},
+        "goals": [{"id": f"g{i}", "goalName": f"Goal {i}", "goalDescription": "Walk 30 minutes after dinner " * 3}
+                  for i in range(goals)],
+        "recent_moods": [{"endDate": "2025-01-01T00:00:00Z", "mood": "ok", "emotions": ["calm"],
+                          "note": "Long day at work, short walk in the evening " * 2} for _ in range(moods)],
+    }
+
+def worker(mode, n):
+    from benchmarks.fake_llm_server import create_app
+
+    received = {"requests": 0, "bytes": 0}
+    llm_port, sink_port = _free_port(), _free_port()
+    _serve(create_app(latency_ms=0), llm_port)
+    _serve(_langsmith_sink(received), sink_port)
+    os.environ.update({
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{llm_port}/v1",
+        "DEEPSEEK_BASE_URL": f"http://127.0.0.1:{llm_port}/v1",
+        "LANGSMITH_ENDPOINT": f"http://127.0.0.1:{sink_port}",
+        "LANGSMITH_API_KEY": "benchmark",
+        "RESPONSE_CACHE_ENABLED": "false",
+        **MODES[mode],
+    })
+    from backend import llm_utils, tracing
+
+    history = []
+    for i in range(5):
+        history.append({"role": "user", "content": f"I walked today and felt better, number {i}. Email me at sam@example.com"})
+        history.append({"role": "assistant", "content": "That's great to hear! Keep it up."})
+    history.append({"role": "user", "content": "Any tips to keep going this week?"})
+    user_data = _user_data()
+
+    async def run():
+        await llm_utils.get_reply("main", history, user_data)  # warm up clients
+        wall = []
+        cpu_start = time.process_time()
+        for _ in range(n):
+            start = time.perf_counter()
+            await llm_utils.get_reply("main", history, user_data)
+            wall.append((time.perf_counter() - start) * 1000)
+        return wall, cpu_start
+
+    wall, cpu_start = asyncio.run(run())
+    if tracing._client is not None:
+        tracing._client.flush()
+    cpu_ms = (time.process_time() - cpu_start) * 1000 / n
+    wall.sort()
+    stats = tracing.tracing_stats()
+    print(
+        f"{mode:>8}: p50={statistics.median(wall):6.2f}ms p95={wall[int(len(wall) * 0.95) - 1]:6.2f}ms "
+        f"cpu/turn={cpu_ms:6.2f}ms traced={stats['sampled']}/{stats['calls']} "
+        f"exported={received['bytes'] / 1024:.0f}KiB in {received['requests']} requests"
+    )
+
+def main(modes, n):
+    for mode in modes:
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.tracing_benchmark", "--worker", mode, "-n", str(n)],
+            capture_output=True, text=True,
+        )
+        lines = [line for line in out.stdout.splitlines() if line.lstrip().startswith(f"{mode}:")]
+        print(lines[-1] if lines else f"{mode:>8}: failed\n{out.stderr[-2000:]}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=200)
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--worker", choices=list(MODES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        worker(args.worker, args.n)
+    else:
+        main(args.modes, args.n)
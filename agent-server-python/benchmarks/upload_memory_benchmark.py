@@ -0,0 +1,85 @@
+"""
+Peak Python heap during concurrent voice uploads: previous read-everything
+path vs. the spooled upload handed straight to STT.
+
+    python -m benchmarks.upload_memory_benchmark --uploads 8 --size-mb 10
+
+STT, routing, reply and TTS are replaced by stand-ins so only the upload
+handling is measured. The stand-in STT reads its input in 64 KB chunks, the
+way the HTTP client streams a multipart file.
+"""
+import argparse
+import asyncio
+import io
+import tracemalloc
+from tempfile import SpooledTemporaryFile
+
+from fastapi import UploadFile
+
+import server
+
+CHUNK = 64 * 1024
+
+async def fake_transcribe(audio, file_ext=".m4a"):
+    if isinstance(audio, (bytes, bytearray)):
+        audio = io.BytesIO(audio)
+    while audio.read(CHUNK):
+        await asyncio.sleep(0)
+    return "benchmark transcript"
+
+async def fake_prepare_turn(user_message, uid):
+    return "main", {}, {}
+
+async def fake_get_reply(route, history, user_data, uid):
+    return "ok"
+
+async def fake_synthesize(text, voice="alloy"):
+    return b"\x00" * 1024
+
+def make_upload(size):
+    # Same spooling threshold Starlette uses for multipart files (1 MB)
+    spooled = SpooledTemporaryFile(max_size=1024 * 1024)
+    block = b"\x00" * CHUNK
+    for _ in range(size // CHUNK):
+        spooled.write(block)
+    spooled.seek(0)
+    return UploadFile(spooled, size=size, filename="audio.m4a")
+
+async def legacy_handler(file: UploadFile):
+    # Previous behaviour: full read, debug copy, then another BytesIO copy in STT
+    audio_bytes = await file.read()
+    with open("/dev/null", "wb") as f:
+        f.write(audio_bytes)
+    await fake_transcribe(io.BytesIO(audio_bytes))
+
+async def current_handler(file: UploadFile):
+    await server.voice_chat_endpoint(file=file, history=None, uid=None, voice="alloy")
+
+async def measure(handler, uploads, size):
+    files = [make_upload(size) for _ in range(uploads)]
+    tracemalloc.start()
+    await asyncio.gather(*(handler(f) for f in files))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    for f in files:
+        f.file.close()
+    return peak
+
+async def main(uploads, size_mb):
+    server.transcribe_audio = fake_transcribe
+    server.prepare_turn = fake_prepare_turn
+    server.get_reply = fake_get_reply
+    server.synthesize_speech = fake_synthesize
+    size = size_mb * 1024 * 1024
+    legacy = await measure(legacy_handler, uploads, size)
+    current = await measure(current_handler, uploads, size)
+    print(f"{uploads} concurrent uploads of {size_mb} MB")
+    print(f"legacy peak:  {legacy / 1024 / 1024:8.1f} MB")
+    print(f"current peak: {current / 1024 / 1024:8.1f} MB")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uploads", type=int, default=8)
+    parser.add_argument("--size-mb", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.uploads, args.size_mb))
@@ -1,18 +1,41 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from backend.models import ChatRequest
-from backend.llm_utils import sanitize_history, route_message, get_reply
-from backend.rag_utils import get_user_data
-from backend.models import ChatRequest, SummaryRequest
-from backend.llm_utils import sanitize_history, route_message, get_reply, generate_chat_summary
+from backend.rag_utils import get_user_data_async, user_context_cache, snapshot_store, run_blocking
+from tools.goal_tools import category_index
+from backend.goal_queue import goal_queue
+from backend.timing import timed
+from backend import metrics
+from backend.fast_router import router_stats
+from backend.intent_gate import intent_stats
+from backend.preflight import preflight_stats
+from backend.tracing import tracing_stats
+from backend.token_budget import prompt_token_stats, persona_usage_stats, warm_encodings
+from backend.tool_runner import tool_stats
+from backend.models import ChatRequest, SummaryRequest, SummaryBatchRequest
+from backend.llm_utils import sanitize_history, route_turn, get_reply, stream_reply, generate_chat_summary, generate_chat_summaries, summary_cache, response_cache, model_pool
 from backend.voice.stt import transcribe_audio
-from backend.voice.tts import synthesize_speech
+from backend.voice.tts import synthesize_speech, stream_speech
+from backend.voice import multipart
+from backend.voice.pipeline import split_sentences, pipelined_speech
+from backend.voice.debug_capture import maybe_capture_upload
+from backend.deadlines import Deadline, DEADLINE, run_with_deadline, iterate_with_deadline, record_stream_cancelled, request_stats
+from backend.config import (
+    TTS_PIPELINE_WINDOW,
+    MAX_UPLOAD_BYTES,
+    CHAT_DEADLINE_SECONDS,
+    CHAT_STREAM_DEADLINE_SECONDS,
+    VOICE_DEADLINE_SECONDS,
+    SUMMARY_BATCH_MAX,
+)
 
 from fastapi import UploadFile, File, Form
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
 import json
-import io
 import base64
+import asyncio
+import os
+
+DEADLINE_REPLY = "Sorry, that's taking me longer than it should. Could you try again in a moment?"
 
 app = FastAPI()
 app.add_middleware(
@@ -20,33 +43,163 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
+
+VOICE_UPLOAD_PATHS = ("/voice-chat", "/voice-chat/stream")
+# Room for the history and other form fields sent alongside the audio
+UPLOAD_FORM_OVERHEAD = 1024 * 1024
+
+class UploadSizeLimit:
+    """
+    Reject a voice upload whose declared Content-Length is over the limit
+    before the body is read. Uploads without one (chunked) are still checked
+    by accept_upload, after spooling.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in VOICE_UPLOAD_PATHS:
+            length = dict(scope["headers"]).get(b"content-length")
+            if length is not None and length.isdigit() and int(length) > MAX_UPLOAD_BYTES + UPLOAD_FORM_OVERHEAD:
+                response = JSONResponse(
+                    {"error": f"Audio upload too large ({int(length)} bytes, max {MAX_UPLOAD_BYTES})"},
+                    status_code=413,
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+app.add_middleware(UploadSizeLimit)
+
+@app.on_event("startup")
+async def preload_categories():
+    try:
+        await run_blocking(category_index.refresh)
+    except Exception as e:
+        print("Category preload error:", e)
+
+@app.on_event("startup")
+async def load_token_encodings():
+    # The first prompt would otherwise load tiktoken on the event loop
+    models = {"gpt-4o", *(b.model_name for b in model_pool.backends.values())}
+    await run_blocking(warm_encodings, sorted(models))
+
+@app.on_event("startup")
+async def start_goal_queue():
+    # Also resumes goals a previous process spooled but never committed
+    await run_blocking(goal_queue.start)
+
+@app.on_event("shutdown")
+async def stop_goal_queue():
+    await run_blocking(goal_queue.stop)
+
+@app.on_event("shutdown")
+async def close_user_snapshots():
+    await run_blocking(snapshot_store.close)
+
+async def prepare_turn(user_message, user_id):
+    """
+    Run route classification and the user-context reads concurrently.
+    Returns (route, user_data, timings, preflight) with per-stage timings in
+    ms; preflight is None unless the preflight call is enabled and succeeded.
+    """
+    timings = {}
+    route_task = timed("route", route_turn(user_message), timings)
+    if user_id:
+        (route, preflight), user_data = await asyncio.gather(
+            route_task,
+            timed("context", get_user_data_async(user_id, timings), timings),
+        )
+    else:
+        (route, preflight), user_data = await route_task, {}
+    print("Pipeline timings (ms):", timings)
+    return route, user_data, timings, preflight
+
+async def chat_turn(user_message, history, user_id):
+    route, user_data, _, preflight = await prepare_turn(user_message, user_id)
+    simple_history = sanitize_history(history)
+    simple_history.append({"role": "user", "content": user_message})
+    return await get_reply(route, simple_history, user_data, user_id, preflight)
 
 @app.post("/chat")
-async def chat_endpoint(req: ChatRequest):
+async def chat_endpoint(req: ChatRequest, request: Request):
     user_message = req.message
     history = req.history or []
     user_id = req.uid
 
     if not user_message:
         return {"error": "message is required"}
-    user_data = {}
-    if user_id:
-        try:
-            user_data = get_user_data(user_id)
-        except Exception as e:
-            user_data = {}
     try:
-        route = await route_message(user_message)
-        simple_history = sanitize_history(history)
-        simple_history.append({"role": "user", "content": user_message})
-        reply = await get_reply(route, simple_history, user_data, user_id)
+        deadline = Deadline(CHAT_DEADLINE_SECONDS)
+        reply, status = await run_with_deadline(
+            request, chat_turn(user_message, history, user_id), deadline
+        )
+        if status == "deadline":
+            return {"reply": DEADLINE_REPLY, "deadline_exceeded": True}
+        if status == "cancelled":
+            # Client is gone; nothing will read this
+            return JSONResponse({"error": "client disconnected"}, status_code=499)
         if not reply:
             reply = "I'm here to help with your wellness journey! What would you like to work on today?"
         return {"reply": reply}
     except Exception as e:
         return {"reply": "Sorry, I'm having trouble right now. Could you try again in a moment?"}
 
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(req: ChatRequest):
+    user_message = req.message
+    history = req.history or []
+    user_id = req.uid
+
+    if not user_message:
+        return JSONResponse({"error": "message is required"}, status_code=400)
+
+    async def chat_events():
+        route, user_data, timings, preflight = await prepare_turn(user_message, user_id)
+        yield "route", {"route": route, "timings": timings}
+        simple_history = sanitize_history(history)
+        simple_history.append({"role": "user", "content": user_message})
+        async for event, data in stream_reply(route, simple_history, user_data, user_id, preflight):
+            yield event, data
+
+    async def event_stream():
+        # Headers go out immediately; routing and context fetch happen inside
+        # the stream so the client sees the connection open right away.
+        yield ": connected\n\n"
+        deadline = Deadline(CHAT_STREAM_DEADLINE_SECONDS)
+        partial = []
+        try:
+            async for item in iterate_with_deadline(chat_events(), deadline):
+                if item is DEADLINE:
+                    reply = "".join(partial) or DEADLINE_REPLY
+                    yield _sse("deadline", {"seconds": deadline.seconds})
+                    yield _sse("done", {"reply": reply, "partial": bool(partial)})
+                    return
+                event, data = item
+                if event == "token":
+                    partial.append(data["content"])
+                yield _sse(event, data)
+        except asyncio.CancelledError:
+            # Starlette cancels the stream when the client disconnects
+            record_stream_cancelled()
+            raise
+        except Exception as e:
+            print("Chat stream error:", e)
+            yield _sse("error", {"message": "Sorry, I'm having trouble right now. Could you try again in a moment?"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.post("/summarize")
 async def summarize_endpoint(req: SummaryRequest):
     try:
@@ -59,46 +212,118 @@ async def summarize_endpoint(req: SummaryRequest):
     except Exception as e:
         print("Summary endpoint error:", e)
         return {"summary": "New Chat"}
+
+@app.post("/summarize/batch")
+async def summarize_batch_endpoint(req: SummaryBatchRequest):
+    if len(req.conversations) > SUMMARY_BATCH_MAX:
+        return JSONResponse(
+            {"error": f"Too many conversations ({len(req.conversations)}, max {SUMMARY_BATCH_MAX})"},
+            status_code=413,
+        )
+    try:
+        summaries = await generate_chat_summaries([c.messages for c in req.conversations])
+    except Exception as e:
+        print("Summary batch endpoint error:", e)
+        summaries = ["New Chat"] * len(req.conversations)
+    return {
+        "summaries": [
+            {"id": c.id, "summary": summary}
+            for c, summary in zip(req.conversations, summaries)
+        ]
+    }
     
+def upload_size(file: UploadFile):
+    if file.size is not None:
+        return file.size
+    file.file.seek(0, os.SEEK_END)
+    size = file.file.tell()
+    file.file.seek(0)
+    return size
+
+async def accept_upload(file: UploadFile):
+    """
+    Size-check an audio upload and return its file object, rewound, for
+    streaming to STT. Returns a 413 JSONResponse instead if it is too large.
+    The body has been spooled by now; UploadSizeLimit rejects uploads whose
+    Content-Length is already too large before that.
+    """
+    size = upload_size(file)
+    print("Received file:", file.filename or "audio.m4a", "length:", size)
+    if size > MAX_UPLOAD_BYTES:
+        return JSONResponse(
+            {"error": f"Audio upload too large ({size} bytes, max {MAX_UPLOAD_BYTES})"},
+            status_code=413,
+        )
+    await maybe_capture_upload(file.file, ".m4a")
+    file.file.seek(0)
+    return file.file
+
+async def voice_turn(audio_file, history, uid):
+    """Transcribe the upload and generate the text reply. Returns (transcript, reply)."""
+    # Always use m4a extension for Whisper
+    user_message = await transcribe_audio(audio_file, ".m4a")
+
+    print("WHISPER transcript:", repr(user_message))
+
+    # Prepare chat history
+    simple_history = json.loads(history) if history else []
+    simple_history.append({"role": "user", "content": user_message})
+
+    # Chat logic
+    route, user_data, _, preflight = await prepare_turn(user_message, uid)
+    reply = await get_reply(route, simple_history, user_data, uid, preflight)
+    if not reply:
+        reply = "I'm here to help with your wellness journey! What would you like to work on today?"
+    return user_message, reply
+
+async def multipart_with_deadline(boundary, body, deadline):
+    """Relay a multipart body, closing it with an error part if the deadline passes."""
+    try:
+        async for chunk in iterate_with_deadline(body, deadline):
+            if chunk is DEADLINE:
+                yield multipart.part_end()
+                yield multipart.json_part(boundary, {"error": "deadline exceeded", "reply": DEADLINE_REPLY})
+                yield multipart.closing(boundary)
+                return
+            yield chunk
+    except asyncio.CancelledError:
+        # Starlette cancels the stream when the client disconnects
+        record_stream_cancelled()
+        raise
+
+async def voice_reply_audio(audio_file, history, uid, voice):
+    user_message, reply = await voice_turn(audio_file, history, uid)
+    # Synthesize speech (should also be m4a, but OpenAI handles this)
+    audio_data = await synthesize_speech(reply, voice)
+    return user_message, reply, audio_data
+
 @app.post("/voice-chat")
 async def voice_chat_endpoint(
+    request: Request,
     file: UploadFile = File(...),
     history: str = Form(None),
     uid: str = Form(None),
     voice: str = Form("alloy")
 ):
     try:
-        audio_bytes = await file.read()
-        filename = file.filename or "audio.m4a"
-        print("Received file:", filename, "length:", len(audio_bytes))
+        audio_file = await accept_upload(file)
+        if isinstance(audio_file, JSONResponse):
+            return audio_file
 
-        # Optional: Save for debugging - confirm m4a
-        with open("debug_received.m4a", "wb") as f:
-            f.write(audio_bytes)
-
-        # Always use m4a extension for Whisper
-        user_message = await transcribe_audio(audio_bytes, ".m4a")
-
-        print("WHISPER transcript:", repr(user_message))
-
-        # Prepare chat history
-        simple_history = json.loads(history) if history else []
-        simple_history.append({"role": "user", "content": user_message})
-
-        # Chat logic
-        user_data = {}
-        if uid:
-            try:
-                user_data = get_user_data(uid)
-            except Exception:
-                user_data = {}
-        route = await route_message(user_message)
-        reply = await get_reply(route, simple_history, user_data, uid)
-        if not reply:
-            reply = "I'm here to help with your wellness journey! What would you like to work on today?"
-
-        # Synthesize speech (should also be m4a, but OpenAI handles this)
-        audio_data = await synthesize_speech(reply, voice)
+        deadline = Deadline(VOICE_DEADLINE_SECONDS)
+        result, status = await run_with_deadline(
+            request, voice_reply_audio(audio_file, history, uid, voice), deadline
+        )
+        if status == "deadline":
+            return {
+                "user_transcript": None,
+                "reply": DEADLINE_REPLY,
+                "audio_base64": None,
+                "deadline_exceeded": True
+            }
+        if status == "cancelled":
+            return JSONResponse({"error": "client disconnected"}, status_code=499)
+        user_message, reply, audio_data = result
         base64_audio = base64.b64encode(audio_data).decode()
 
         # Return JSON with transcript, reply, audio
@@ -111,6 +336,127 @@ async def voice_chat_endpoint(
         print("Voice chat error:", e)
         return JSONResponse({"error": str(e)}, status_code=500)
 
+@app.post("/voice-chat/stream")
+async def voice_chat_stream_endpoint(
+    request: Request,
+    file: UploadFile = File(...),
+    history: str = Form(None),
+    uid: str = Form(None),
+    voice: str = Form("alloy"),
+    pipelined: bool = Form(False)
+):
+    """
+    multipart/mixed response: a JSON part with the transcript and reply text,
+    then an audio/mpeg part whose bytes are relayed as TTS produces them.
+
+    With pipelined=true the reply is streamed from the LLM and split into
+    sentences, each synthesized as soon as it is complete: the transcript part
+    is followed by a JSON {"index", "sentence"} part and an audio/mpeg part
+    per sentence, then a final JSON part with the full reply.
+    """
+    boundary = multipart.new_boundary()
+    try:
+        audio_file = await accept_upload(file)
+        if isinstance(audio_file, JSONResponse):
+            return audio_file
+        deadline = Deadline(VOICE_DEADLINE_SECONDS)
+        if pipelined:
+            return StreamingResponse(
+                multipart_with_deadline(
+                    boundary, pipelined_voice_body(boundary, audio_file, history, uid, voice), deadline
+                ),
+                media_type=multipart.content_type(boundary),
+            )
+        result, status = await run_with_deadline(request, voice_turn(audio_file, history, uid), deadline)
+        if status == "deadline":
+            return JSONResponse({"error": "deadline exceeded", "reply": DEADLINE_REPLY}, status_code=504)
+        if status == "cancelled":
+            return JSONResponse({"error": "client disconnected"}, status_code=499)
+        user_message, reply = result
+    except Exception as e:
+        print("Voice chat error:", e)
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+    async def body():
+        yield multipart.json_part(boundary, {"user_transcript": user_message, "reply": reply})
+        yield multipart.part_header(boundary, "audio/mpeg")
+        try:
+            async for chunk in stream_speech(reply, voice):
+                yield chunk
+        except Exception as e:
+            # Headers are already sent; report the failure as a trailing part
+            print("Voice stream TTS error:", e)
+            yield multipart.part_end()
+            yield multipart.json_part(boundary, {"error": str(e)})
+            yield multipart.closing(boundary)
+            return
+        yield multipart.part_end()
+        yield multipart.closing(boundary)
+
+    return StreamingResponse(
+        multipart_with_deadline(boundary, body(), deadline),
+        media_type=multipart.content_type(boundary),
+    )
+
+async def pipelined_voice_body(boundary, audio_file, history, uid, voice):
+    try:
+        user_message = await transcribe_audio(audio_file, ".m4a")
+        print("WHISPER transcript:", repr(user_message))
+        yield multipart.json_part(boundary, {"user_transcript": user_message})
+
+        simple_history = json.loads(history) if history else []
+        simple_history.append({"role": "user", "content": user_message})
+        route, user_data, _, preflight = await prepare_turn(user_message, uid)
+
+        reply_parts = []
+
+        async def deltas():
+            async for event, data in stream_reply(route, simple_history, user_data, uid, preflight):
+                if event == "token":
+                    reply_parts.append(data["content"])
+                    yield data["content"]
+                elif event == "error":
+                    reply_parts.append(data["message"])
+                    yield data["message"]
+
+        sentences = split_sentences(deltas())
+        index = 0
+        async for sentence, audio in pipelined_speech(sentences, voice, TTS_PIPELINE_WINDOW):
+            yield multipart.json_part(boundary, {"index": index, "sentence": sentence})
+            yield multipart.part_header(boundary, "audio/mpeg")
+            yield audio
+            yield multipart.part_end()
+            index += 1
+        yield multipart.json_part(boundary, {"reply": "".join(reply_parts)})
+    except Exception as e:
+        print("Pipelined voice error:", e)
+        yield multipart.json_part(boundary, {"error": str(e)})
+    yield multipart.closing(boundary)
+
+@app.get("/stats")
+async def stats_endpoint():
+    return {
+        "router": router_stats(),
+        "goal_intent": intent_stats(),
+        "preflight": preflight_stats(),
+        "user_context_cache": user_context_cache.stats(),
+        "user_snapshots": snapshot_store.stats(),
+        "response_cache": response_cache.stats(),
+        "prompt_tokens": prompt_token_stats(),
+        "persona_usage": persona_usage_stats(),
+        "tools": tool_stats(),
+        "requests": request_stats(),
+        "model_pool": model_pool.stats(),
+        "summary_cache": summary_cache.stats(),
+        "goal_queue": await run_blocking(goal_queue.stats),
+        "tracing": tracing_stats(),
+    }
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    # Prometheus text exposition format
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,7 +1,10 @@
-from google.cloud import firestore
+import os
+import threading
+import time
 from langchain_core.tools import tool
 from datetime import datetime, timedelta
 import pytz
+from backend.firestore_client import get_db
 
 APP_TO_DB_CATEGORY = {
     "vocational": "occupational",
@@ -10,6 +13,95 @@ APP_TO_DB_CATEGORY = {
 def to_db_category(slug):
     return APP_TO_DB_CATEGORY.get(slug, slug)
 
+class CategoryIndex:
+    """
+    In-memory copy of the (effectively static) goals_categories collection,
+    keyed by cat_slug. Loaded on first use or at startup, and refreshed in the
+    background once older than `refresh_seconds` while stale data keeps
+    being served. An unknown slug triggers one reload, after which the miss
+    is remembered for `refresh_seconds`.
+    """
+
+    MAX_MISSES = 256
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._by_slug = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()  # one blocking load at a time
+        self._refreshing = False
+        self._misses = {}  # slug -> when a reload last failed to find it
+
+    def refresh(self):
+        by_slug = {}
+        for doc in get_db().collection("goals_categories").stream():
+            cat_data = doc.to_dict()
+            slug = cat_data.get("cat_slug", "unknown")
+            by_slug[slug] = {
+                "id": doc.id,
+                "name": cat_data.get("cat_name", "Unknown"),
+                "slug": slug,
+                "description": cat_data.get("cat_description", "")
+            }
+        with self._lock:
+            self._by_slug = by_slug
+            self._loaded_at = time.monotonic()
+            self._refreshing = False
+            self._misses = {}
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"Category refresh error: {e}")
+            with self._lock:
+                self._refreshing = False
+
+    def _ensure_fresh(self):
+        if self._loaded_at is None:
+            with self._load_lock:
+                # Concurrent first requests wait for a single load
+                if self._loaded_at is None:
+                    self.refresh()
+            return
+        with self._lock:
+            stale = time.monotonic() - self._loaded_at > self.refresh_seconds
+            if not stale or self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh_in_background, daemon=True).start()
+
+    def _recently_missed(self, slug):
+        missed_at = self._misses.get(slug)
+        return missed_at is not None and time.monotonic() - missed_at < self.refresh_seconds
+
+    def get(self, slug):
+        self._ensure_fresh()
+        category = self._by_slug.get(slug)
+        if category is not None or self._recently_missed(slug):
+            return category
+        with self._load_lock:
+            category = self._by_slug.get(slug)
+            if category is None and not self._recently_missed(slug):
+                # Possibly added since the last load
+                self.refresh()
+                category = self._by_slug.get(slug)
+                if category is None:
+                    with self._lock:
+                        if len(self._misses) >= self.MAX_MISSES:
+                            self._misses.clear()
+                        self._misses[slug] = time.monotonic()
+        return category
+
+    def all(self):
+        self._ensure_fresh()
+        return list(self._by_slug.values())
+
+category_index = CategoryIndex(
+    refresh_seconds=float(os.getenv("GOAL_CATEGORY_REFRESH_SECONDS", "3600"))
+)
+
 def add_goal_to_firestore(user_id, goal_name, goal_description, category_slug, 
                          timeframe="Month", reminder_enabled=True, duration_weeks=6):
     """
@@ -24,19 +116,17 @@ def add_goal_to_firestore(user_id, goal_name, goal_description, category_slug,
         reminder_enabled: Whether to enable reminders
         duration_weeks: How many weeks the goal should run
     """
-    db = firestore.Client()
+    db = get_db()
     
     # Map app slug to db slug
     category_slug = to_db_category(category_slug)
     
     # Look up the category
-    cat_docs = db.collection("goals_categories").where("cat_slug", "==", category_slug).stream()
-    cat_doc = next(cat_docs, None)
-    if not cat_doc:
+    category = category_index.get(category_slug)
+    if not category:
         raise Exception(f"Category with slug '{category_slug}' not found.")
     
-    cat_id = cat_doc.id
-    cat_data = cat_doc.to_dict()
+    cat_id = category["id"]
     
     # Create timestamps
     now = datetime.now(pytz.UTC)
@@ -55,13 +145,30 @@ def add_goal_to_firestore(user_id, goal_name, goal_description, category_slug,
         "wellnessDimension_ref": f"/goals_categories/{cat_id}",      
     }
     
+    from backend.config import GOAL_WRITE_BEHIND
+    from backend.rag_utils import cache_goal_added
+
+    if GOAL_WRITE_BEHIND:
+        # Spool it and answer now; the queue commits it in the background
+        from backend.goal_queue import goal_queue, idempotency_key
+        key = idempotency_key(user_id, goal_name, category_slug, timeframe, now.date().isoformat())
+        result = goal_data.copy()
+        result["id"] = key
+        result["queued"] = True
+        if goal_queue.enqueue(key, user_id, goal_data):
+            cache_goal_added(user_id, result)
+        return result
+
     # Add to Firestore
     doc_ref = db.collection("goals").add(goal_data)
     
     # Return the data with the document ID
     result = goal_data.copy()
     result["id"] = doc_ref[1].id  # doc_ref is a tuple (timestamp, document_reference)
-    
+
+    # Make the new goal visible on the user's next turn without a re-read
+    cache_goal_added(user_id, result)
+
     return result
 
 @tool("add_goal")
@@ -114,18 +221,6 @@ def add_goal_tool(user_id: str, goal_name: str, goal_description: str, category_
 def list_goal_categories():
     """List all available wellness dimension categories for goals."""
     try:
-        db = firestore.Client()
-        categories = []
-        
-        for doc in db.collection("goals_categories").stream():
-            cat_data = doc.to_dict()
-            categories.append({
-                "id": doc.id,
-                "name": cat_data.get("cat_name", "Unknown"),
-                "slug": cat_data.get("cat_slug", "unknown"),
-                "description": cat_data.get("cat_description", "")
-            })
-        
-        return {"categories": categories}
+        return {"categories": category_index.all()}
     except Exception as e:
         return {"error": str(e), "categories": []}
\ No newline at end of file